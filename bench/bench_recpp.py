@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#! /usr/bin/env python3
+
+# ---------------------------------------------
+# Microbenchmarks of the cooking pipeline
+#
+# Times recipe loading, listing, dispatch, full scripted cooks of each
+# dish and template rendering (with and without the render cache),
+# stores the results as json and compares them against a saved baseline
+# (exit code 1 on regression).
+# ---------------------------------------------
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+os.chdir(str(_root))
+sys.path.insert(0, str(_root))
+
+import recpp  # noqa: E402
+
+_all_dishes = ["design", "class", "function", "lambda", "ds", "algo", "impl"]
+
+# Scripted answers of a representative cook for each dish
+_cook_answers = {
+    "design": ["unit", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n", "n"],
+    "class": ["Foo", "holds foo", "inv", "thread-safe", "concrete", 1, "typename T", False, True, True, True],
+    "function": ["g", "y", "does g", "y", 2, "x", "char*", "y", "n", "n", "n", "y", "y", "y", "unique_ptr<int>",
+                 "n", "n", "y2", "bool", "n", "int&", "n", "y", "int", "n", "y", "y"],
+    "lambda": ["y", "n", 1, "typename T", 1, "a", "int", "n", 2, "&x", "this", "n"],
+    "ds": ["lookup", "y", "n", "y", "n"],
+    "algo": ["sort", "n", "n", "y"],
+    "impl": [],
+}
+
+# Cooks whose dish templates are rendered (template name: dish, answers)
+_render_cases = {
+    "concrete_class.h": ("class", _cook_answers["class"]),
+    "hierarchy_class.h": ("class", ["Derived", "", "", "", "hierarchy", 2, "typename T", "int N", False, "Base", True, False]),
+    "function.h": ("function", _cook_answers["function"]),
+    "function_bench.cpp": ("function", ["f", "n", "n", "", "n", 0, 2, "v", "std::vector<int>&&", "n", "k", "int", "n",
+                                        "long", "n", "n", "n", "n"]),
+}
+
+
+def cooked(dish: str, answers: list):
+    '''Cook a dish with scripted answers (benchmarks enabled) and return the cook'''
+    cook = recpp._recpp_cookbook[dish](recpp.load_recipe(dish))
+    cook.ostream = io.StringIO()
+    cook.bench = True
+    cook.input_provider = recpp.ScriptedAnswers(answers)
+    cook.cook(do_live_annot=False)
+    return cook
+
+
+def bench_cases():
+    '''Benchmarked callables (name: callable)'''
+    cases = {}
+
+    def cold_cookbook():
+        recpp._recpp_cookbooks.clear()
+        recpp.load_cookbook()
+
+    cases["load_cookbook.cold"] = cold_cookbook
+    cases["load_recipe"] = lambda: recpp.load_recipe("class")
+
+    recpp.load_cookbook()
+    sources = recpp._recpp_cookbooks[str(Path("recipes").resolve())]["sources"]
+    cases["compile_cookbook"] = lambda: recpp.compile_cookbook(sources, "recipes")
+
+    for dish in _all_dishes:
+        def cold_plan(dish=dish):
+            recpp._recpp_dispatch_plans.clear()
+            recpp._recpp_cookbook[dish].dispatch_plan(recpp.load_recipe(dish))
+        cases[f"dispatch_plan.{dish}"] = cold_plan
+
+    def cold_index():
+        recpp._recpp_annotation_indexes.clear()
+        recpp.annotation_index(_all_dishes)
+
+    cases["annotation_index.all"] = cold_index
+
+    for dish in _all_dishes + ["all"]:
+        def listing(dish=dish, annot=True, query=""):
+            with redirect_stdout(io.StringIO()):
+                recpp.recipe(dish, annot, query)
+        if dish != "all":
+            cases[f"recipe.{dish}.steps"] = lambda dish=dish: listing(dish, False)
+        cases[f"recipe.{dish}.annot"] = lambda dish=dish: listing(dish, True, "*")
+        cases[f"recipe.{dish}.query"] = lambda dish=dish: listing(dish, True, "PERF AND NOT MAINT")
+
+    for dish in _all_dishes:
+        def full_cook(dish=dish):
+            cooked(dish, _cook_answers[dish]).serve_dish("")
+        cases[f"cook.{dish}"] = full_cook
+
+    # Renders are only memoized by resident modes by default
+    recpp.resident_render_cache()
+    for name, (dish, answers) in _render_cases.items():
+        cook = cooked(dish, answers)
+        tpl, ctx = next((t, c) for n, t, c in cook.dish_templates() if n == name)
+        cases[f"render.{name}"] = lambda tpl=tpl, ctx=ctx, env=cook.env: env.get_template(tpl).render(ctx)
+        cases[f"render.cached.{name}"] = lambda tpl=tpl, ctx=ctx, cook=cook: "".join(cook.render_chunks(tpl, ctx))
+
+    return cases
+
+
+def run_case(fn, repeat: int):
+    '''Time a callable, return per call stats in us'''
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    times = [t / loops * 1e6 for t in timer.repeat(repeat=repeat, number=loops)]
+    return {"median_us": round(statistics.median(times), 3),
+            "min_us": round(min(times), 3),
+            "loops": loops}
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    '''Print the comparison with a baseline, return the list of regressed cases'''
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:32} {res['median_us']:12.3f} us        (new)")
+            continue
+        ratio = res["median_us"] / base["median_us"] if base["median_us"] else 1.
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = "improved"
+        print(f"{name:32} {res['median_us']:12.3f} us {ratio:7.2f}x {flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="benchmark the recpp cooking pipeline")
+    parser.add_argument('--baseline', dest='baseline', default=str(_root / "bench" / "baseline.json"),
+                        help='baseline result file (default: bench/baseline.json)')
+    parser.add_argument('--output', dest='output', default="",
+                        help='write the results to a json file')
+    parser.add_argument('--save-baseline', dest='save_baseline', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--threshold', dest='threshold', type=float, default=0.2,
+                        help='relative slowdown reported as a regression (default: 0.2)')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=5,
+                        help='number of timed repeats per case (default: 5)')
+    parser.add_argument('--filter', dest='filter', default="",
+                        help='only run the cases whose name contains this string')
+    args = parser.parse_args()
+
+    results = {name: run_case(fn, args.repeat)
+               for name, fn in bench_cases().items() if args.filter in name}
+    report = {"python": platform.python_version(),
+              "platform": platform.platform(),
+              "results": results}
+
+    if args.output:
+        with open(args.output, "w", encoding="utf8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf8") as f:
+            json.dump(report, f, indent=2)
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, "r", encoding="utf8") as f:
+            baseline = json.load(f)["results"]
+    elif not args.save_baseline:
+        print(f"INFO: no baseline in {args.baseline}, use --save-baseline to create it")
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"ERROR: {len(regressions)} case(s) over the {args.threshold:.0%} regression threshold")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#! /usr/bin/env python3
+
+# ---------------------------------------------
+# Load generator of the recpp http service
+#
+# Runs concurrent clients that each cook dishes from start to render
+# through the http service (started on a free local port unless --url
+# is given) and reports sessions per second and step latencies.
+# ---------------------------------------------
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from urllib.parse import urlsplit
+
+_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_recpp import _cook_answers  # noqa: E402
+
+
+class Client(object):
+    '''Keep-alive http client of the service'''
+
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode("utf8") if body is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                          f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            header = await self.reader.readline()
+            if not header.strip():
+                break
+            name, _, value = header.decode("latin1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self.reader.readexactly(length))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def cook_session(client: Client, dish: str, latencies: list):
+    '''Cook a dish through the service, return True if it was rendered'''
+    async def step(method, path, body=None):
+        start = time.perf_counter()
+        status, result = await client.request(method, path, body)
+        latencies.append(time.perf_counter() - start)
+        return status, result
+
+    status, state = await step("POST", "/sessions", {"dish": dish})
+    if status != 201:
+        return False
+    sid = state["session"]
+    for answer in _cook_answers[dish]:
+        if state["done"]:
+            break
+        status, state = await step("POST", f"/sessions/{sid}/answer", {"answer": answer})
+        if status != 200:
+            return False
+    status, _ = await step("GET", f"/sessions/{sid}/dish")
+    await step("DELETE", f"/sessions/{sid}")
+    return status == 200 and state["done"]
+
+
+async def run_clients(host: str, port: int, dishes: list, sessions: int, concurrency: int):
+    '''Run the clients, return (elapsed seconds, cooked sessions, failed sessions, latencies)'''
+    latencies = []
+    results = []
+    todo = iter(range(sessions))
+
+    async def worker():
+        client = Client(host, port)
+        try:
+            for i in todo:
+                results.append(await cook_session(client, dishes[i % len(dishes)], latencies))
+        finally:
+            client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, results.count(True), results.count(False), latencies
+
+
+def percentile(values: list, p: float):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def start_service(max_sessions: int):
+    '''Start the service on a free local port, return (process, port)'''
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, str(_root / "recpp.py"), "--http", f"127.0.0.1:{port}",
+                             "--max-sessions", str(max_sessions)], stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc, port
+        except OSError:
+            time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("http service did not start")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="load test the recpp http service")
+    parser.add_argument('--url', dest='url', default="",
+                        help='service url (default: start a local service)')
+    parser.add_argument('--sessions', dest='sessions', type=int, default=500,
+                        help='number of cooked sessions (default: 500)')
+    parser.add_argument('--concurrency', dest='concurrency', type=int, default=32,
+                        help='number of concurrent clients (default: 32)')
+    parser.add_argument('--dish', dest='dishes', action='append', choices=sorted(_cook_answers),
+                        help='dish cooked by the clients, can be repeated (default: class and function)')
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        proc, port = start_service(max(1000, args.concurrency))
+        host = "127.0.0.1"
+
+    try:
+        elapsed, cooked, failed, latencies = asyncio.run(
+            run_clients(host, port, args.dishes or ["class", "function"], args.sessions, args.concurrency))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    print(f"sessions: {cooked} cooked, {failed} failed in {elapsed:.2f} s ({cooked / elapsed:.1f} sessions/s)")
+    if latencies:
+        print(f"steps: {len(latencies)}, latency p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+              f"p99 {percentile(latencies, 99) * 1000:.2f} ms, max {max(latencies) * 1000:.2f} ms")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+#! /usr/bin/env python3
+
+# ---------------------------------------------
+# Startup budget check for list mode
+#
+# Fails (exit code 1) if `recpp.py -d all -l -a`:
+# - imports a module that is only needed to render or cook dishes,
+# - takes more than the budget on top of a bare interpreter startup.
+# ---------------------------------------------
+import os
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+_list_cmd = [sys.executable, "recpp.py", "-d", "all", "-l", "-a"]
+
+# Modules that list mode must never import
+_forbidden_modules = ["jinja2", "concurrent.futures", "inspect", "yaml"]
+
+
+def run_time(cmd, runs: int):
+    '''Median wall time of a command in ms'''
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=str(_root), stdout=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def imported_modules(cmd):
+    '''Names of the modules imported by a python command'''
+    res = subprocess.run(cmd[:1] + ["-X", "importtime"] + cmd[1:], cwd=str(_root),
+                         stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                         universal_newlines=True, check=True)
+    return [line.split("|")[-1].strip() for line in res.stderr.splitlines()
+            if line.startswith("import time:")]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="check recpp list mode startup budget")
+    parser.add_argument('--budget', dest='budget', type=float,
+                        default=float(os.environ.get("RECPP_STARTUP_BUDGET_MS", 100)),
+                        help='max overhead in ms over a bare interpreter startup (default: 100 or RECPP_STARTUP_BUDGET_MS)')
+    parser.add_argument('--runs', dest='runs', type=int, default=15,
+                        help='number of timed runs (default: 15)')
+    args = parser.parse_args()
+
+    # Untimed run to warm the compiled cookbook cache
+    subprocess.run(_list_cmd, cwd=str(_root), stdout=subprocess.DEVNULL, check=True)
+
+    failed = False
+    modules = imported_modules(_list_cmd)
+    for name in _forbidden_modules:
+        if name in modules:
+            print(f"ERROR: list mode imports {name}")
+            failed = True
+
+    bare = run_time([sys.executable, "-c", "pass"], args.runs)
+    listing = run_time(_list_cmd, args.runs)
+    overhead = listing - bare
+    print(f"INFO: interpreter {bare:.1f} ms, list mode {listing:.1f} ms, "
+          f"overhead {overhead:.1f} ms (budget {args.budget:.1f} ms)")
+
+    if overhead > args.budget:
+        print("ERROR: list mode startup is over budget")
+        failed = True
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,4214 @@
+# -*- coding: utf-8 -*-
+#! /usr/bin/env/python3
+
+# ---------------------------------------------
+# Imports
+# ---------------------------------------------
+# Only cheap modules are imported here, heavy ones (jinja2, concurrent.futures,
+# inspect, ...) are imported where they are used so that modes that never
+# render a template (e.g. list mode) do not pay for them at startup
+import json
+import copy
+import re
+import os
+import pickle
+import zlib
+import math
+import sys
+import io
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager, nullcontext
+from enum import IntEnum, IntFlag, Enum
+from functools import wraps, partial
+from typing import List, Dict
+from argparse import ArgumentParser, RawTextHelpFormatter
+from pathlib import Path
+from types import MappingProxyType
+
+
+# ---------------------------------------------
+# Globals
+# ---------------------------------------------
+_recpp_header = r"""
+
+ ________________________________________
+|  .--,--.                               |
+|  `.   .'                               |
+|   |___|                                |
+|  <:o o:>        Recpp: Cook your Cpp!  |
+|  _'-^-'_                               |
+| /   *   \                              |
+|________________________________________|
+"""
+_recpp_dish_served = r"""
+      (   )   (
+      )   (   )
+     __..---..__
+ ,-='  /  |  \  `=-.   Dish served!
+:--..___________..--;
+ \.,_____________,./
+"""
+
+_recpp_recipe = r"""
+ __________
+|  RECIPE  |
+|&&& ======|
+|=== ======|
+|=== == %%$|  Here is the recipe!
+|[_] ======|
+|=== ===!##|
+|__________|
+"""
+
+_recpp_cpp_id_regex = re.compile("[a-zA-Z_][a-zA-Z0-9_]*")
+
+# Accepted yes/no answers, the first half means yes
+_recpp_flags = ["1", "y", "yes", "0", "n", "no"]
+
+# Recipe and template directories, relative to the recpp module so that it runs from any directory
+_recpp_dir = Path(__file__).resolve().parent
+_recpp_recipe_path = str(_recpp_dir / "recipes")
+_recpp_template_path = str(_recpp_dir / "templates")
+
+# Buffer size of the writers generated files are streamed into
+_recpp_write_buffer_size = 1 << 16
+
+# Marker lines of the regions merged into existing files (see MergeOutput)
+_recpp_marker_regex = re.compile(rb"[ \t]*//[ \t]*recpp:(begin|end)(?:[ \t]+(\S+))?[ \t]*\r?\n?")
+
+# Templates referenced by a template tag (extends, include, import, from), found
+# without parsing the template: a reference is a string literal, optionally
+# followed by the tag keywords (e.g. "import macro as m", "ignore missing")
+_recpp_template_ref_regex = re.compile(r"\{%[-+]?\s*(?:extends|include|import|from)\s+(.*?)\s*[-+]?%\}", re.S)
+_recpp_template_literal_regex = re.compile(r"""(?:'([^'\\]*)'|"([^"\\]*)")(?:\s+(?:import|as|ignore|with|without)\b.*)?""", re.S)
+
+# Template environments shared by all cooks of the process (per template path)
+_recpp_template_envs = {}
+
+# Compiled cookbooks loaded in the process (per recipe path)
+_recpp_cookbooks = {}
+
+# Dispatch plans compiled in the process (per cook class and recipe)
+_recpp_dispatch_plans = {}
+
+# Annotation indexes built in the process (per dish list)
+_recpp_annotation_indexes = {}
+
+# Decisions memoized in the process (per recipe and feature vector)
+_recpp_decisions = {}
+
+# Version of the compiled cookbook format, bumped when recipes are compiled differently
+_recpp_cookbook_version = 4
+
+# Dishes of the recipe packs, indexed once per process (see recipe_packs)
+_recpp_packs = None
+
+# Render cache of the process (see render_cache) and number of renders it keeps in memory
+_recpp_render_cache = None
+_recpp_render_cache_size = 256
+
+# Render cache mode when RECPP_RENDER_CACHE is not set, resident modes switch it
+# to "memory" (see resident_render_cache): a one-shot run cannot hit the cache
+_recpp_render_cache_mode = "off"
+
+# Lint rules compiled in the process (per rule set)
+_recpp_lint_rules = {}
+
+# Extensions of the C++ files checked in lint mode
+_recpp_lint_extensions = {".h", ".hh", ".hpp", ".hxx", ".h++", ".c", ".cc", ".cpp", ".cxx", ".c++", ".ipp", ".inl", ".tpp"}
+
+# Comments, raw string, string and char literals (not digit separators as in 1'000), lint findings inside them are dropped
+_recpp_lint_skip_regex = re.compile(rb'//[^\n]*|/\*.*?\*/'
+                                    rb'|(?<!\w)(?:u8|[uUL])?R"([^()\\\s]{0,16})\(.*?\)\1"'
+                                    rb'|"(?:\\.|[^"\\\n])*"'
+                                    rb"|(?<!\w)(?:u8|[uUL])?'(?:\\.|[^'\\\n])*'", re.DOTALL)
+
+_recpp_query_token_regex = re.compile(r"\(|\)|,|[^\s(),]+")
+_recpp_word_regex = re.compile(r"[a-z0-9_]+")
+
+# ---------------------------------------------
+# Utilities
+# ---------------------------------------------
+
+
+class InputType(Enum):
+    INT = 1
+    LIST = 2
+    IDENTIFIER = 3
+    TYPE = 4
+    FLAG = 5
+    MISC = 6
+
+
+class RecppError(Exception):
+    def __init__(self, message=""):
+        super().__init__(message)
+
+
+def print_msg(msg, level="ERROR", file=None):
+    '''Print error message'''
+    print(f"{level}: {msg}", file=file)
+
+
+def cache_dir():
+    '''
+    Directory for persistent caches (RECPP_CACHE_DIR or XDG cache dir)
+    :return: cache path or None if it cannot be created or written (caches are skipped)
+    '''
+    path = os.environ.get("RECPP_CACHE_DIR")
+    if not path:
+        path = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "recpp"
+
+    try:
+        Path(path).mkdir(parents=True, exist_ok=True)
+    except OSError:
+        return None
+    if not os.access(str(path), os.W_OK | os.X_OK):
+        return None
+    return Path(path)
+
+
+def write_cache(cfile: Path, data):
+    '''
+    Pickle data in a cache file, written then renamed so that concurrent runs never load a partial file
+    :return: False if the cache file could not be written (the cache is skipped)
+    '''
+    import tempfile
+
+    try:
+        fd, tmp = tempfile.mkstemp(dir=str(cfile.parent), suffix=".tmp")
+    except OSError:
+        return False
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, str(cfile))
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        return False
+    return True
+
+
+def load_bundle():
+    '''
+    Get the recipes and templates compiled in a zipapp build (see tools/build_zipapp.py)
+    :return: bundle module or None when recpp runs from its source tree
+    '''
+    try:
+        import recpp_bundle
+    except ImportError:
+        return None
+    return recpp_bundle
+
+
+def template_env(template_path=_recpp_template_path):
+    '''
+    Get the template environment shared by all cooks for a template path
+    :param template_path: template directory or list of directories searched in order
+
+    Compiled templates are stored in an on-disk bytecode cache, a cache entry
+    is invalidated as soon as the template source checksum changes. A zipapp
+    build loads the templates it was built with, compiled ahead of time.
+    '''
+    paths = [template_path] if isinstance(template_path, str) else list(template_path)
+    key = os.pathsep.join(str(Path(path).resolve()) for path in paths)
+    env = _recpp_template_envs.get(key)
+    bundle = None
+    if env is None and template_path == _recpp_template_path and not os.path.isdir(template_path):
+        bundle = load_bundle()
+    if bundle:
+        # Zipapp build, templates are compiled into python modules of the archive
+        from jinja2 import Environment, ModuleLoader
+        env = Environment(loader=ModuleLoader(str(Path(bundle.__file__).parent / bundle.templates)))
+        _recpp_template_envs[key] = env
+    elif env is None:
+        from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+        bcc_dir = cache_dir()
+        if bcc_dir:
+            bcc_dir = bcc_dir / "templates"
+            try:
+                bcc_dir.mkdir(exist_ok=True)
+            except OSError:
+                bcc_dir = None
+            if bcc_dir and not os.access(str(bcc_dir), os.W_OK | os.X_OK):
+                bcc_dir = None
+        env = Environment(
+            loader=FileSystemLoader(paths),
+            bytecode_cache=FileSystemBytecodeCache(str(bcc_dir)) if bcc_dir else None
+        )
+        _recpp_template_envs[key] = env
+    return env
+
+
+class strong_input(object):
+    '''Class used process input in an homogeneous manner'''
+
+    def __init__(self, input_type, *args, **kwargs):
+        if input_type == InputType.INT:
+            self.input = partial(self.strong_int, *args, **kwargs)
+        elif input_type == InputType.LIST:
+            self.input = partial(self.strong_list, *args, **kwargs)
+        elif input_type == InputType.IDENTIFIER:
+            self.input = partial(self.strong_identifier, *args, **kwargs)
+        elif input_type == InputType.FLAG:
+            self.input = partial(self.strong_flag, *args, **kwargs)
+        elif input_type == InputType.TYPE:
+            self.input = partial(self.strong_type, *args, **kwargs)
+        elif input_type == InputType.MISC:
+            self.input = partial(self.strong_misc, *args, **kwargs)
+        else:
+            raise RecppError("input type not handled")
+
+    def strong_identifier(self, f: callable, *args, **kwargs):
+        while True:
+            identifier = f(*args, **kwargs).strip()
+            if _recpp_cpp_id_regex.fullmatch(identifier):
+                return identifier
+            args[0].input_error("expecting cpp identifier")
+
+    def strong_type(self, f: callable, *args, **kwargs):
+        t = f(*args, **kwargs).strip()
+        if not t:
+            t = "auto"
+        return t
+
+    def strong_misc(self, f: callable, *args, **kwargs):
+        while True:
+            t = f(*args, **kwargs).strip()
+            if t:
+                return t
+            args[0].input_error("expecting a non empty value")
+
+    def strong_flag(self, f: callable, *args, **kwargs):
+        while True:
+            flag = f(*args, **kwargs).strip()
+            if flag in _recpp_flags:
+                return flag in _recpp_flags[0:3]
+            args[0].input_error(f"expecting one of {'/'.join(_recpp_flags)}")
+
+    def strong_int(self, f: callable, *args, **kwargs):
+        while True:
+            try:
+                return int(f(*args, **kwargs).strip())
+            except ValueError:
+                args[0].input_error("expecting an integer")
+
+    def strong_list(self, l: List[str], default_val: str, f: callable, *args, **kwargs):
+        while True:
+            item = f(*args, **kwargs).strip() or default_val
+            if item in l:
+                return item
+            args[0].input_error(f"expecting one of {'/'.join(l)}")
+
+    def __call__(self, f: callable):
+        @wraps(f)
+        def wrapped(*args, **kwargs):
+            return self.input(f, *args, **kwargs)
+        return wrapped
+
+
+class InputProvider(object):
+    '''
+    Source of the answers to the prompts of a recipe
+
+    A provider gives the answer to a prompt (next) and is told when this
+    answer is not valid (reject), by default an invalid answer fails fast
+    as it would be given again and again
+    '''
+
+    # True if the answers are typed by a user on a terminal
+    interactive = False
+
+    def next(self, step: str, query: str, ref=""):
+        '''
+        Get the answer to a prompt
+        :param step: step callback name
+        :param query: prompt
+        :param ref: reference of the step
+        '''
+        raise NotImplementedError
+
+    def reject(self, msg: str):
+        '''Called when the last answer was not valid'''
+        raise RecppError(f"invalid answer: {msg}")
+
+    def close(self):
+        pass
+
+
+class InteractiveInput(InputProvider):
+    '''Answers typed by the user on the terminal'''
+
+    interactive = True
+
+    def next(self, step: str, query: str, ref=""):
+        return input(RecipeCook.format_input(query, ref) + ": ")
+
+    def reject(self, msg: str):
+        '''The user is prompted again'''
+        pass
+
+
+class ScriptedAnswers(InputProvider):
+    '''Answers given up-front to a recipe instead of prompting the user'''
+
+    def __init__(self, answers):
+        '''
+        Constructor
+        :param answers: either a list of answers in prompt order or a dict
+                        of answers keyed by step callback name (e.g. class_root_step_name,
+                        tpl_parameters_repeat), a step that prompts many times takes a list
+        '''
+        if isinstance(answers, dict):
+            self.ordered = None
+            self.by_step = {k: deque(v if isinstance(v, list) else [v])
+                            for k, v in answers.items()}
+        else:
+            self.ordered = deque(answers)
+            self.by_step = {}
+        self.last = None
+
+    @staticmethod
+    def to_str(answer):
+        if isinstance(answer, bool):
+            return "y" if answer else "n"
+        return str(answer)
+
+    def next(self, step: str, query: str, ref=""):
+        answers = self.ordered if self.ordered is not None else self.by_step.get(step)
+        if not answers:
+            raise RecppError(f"no answer left for '{query}' ({step})")
+        answer = ScriptedAnswers.to_str(answers.popleft())
+        self.last = (step, query, answer)
+        return answer
+
+    def reject(self, msg: str):
+        step, query, answer = self.last
+        raise RecppError(f"invalid answer '{answer}' for '{query}' ({step}): {msg}")
+
+
+class RecordingInput(InputProvider):
+    '''
+    Record the answers given by another provider in a session file
+
+    A session file is a json dict with the dish, the live annotation flag
+    and the list of answers ({"step", "query", "answer", "rejected"}), it can
+    be replayed with ReplayInput to cook the same dish without a terminal
+    '''
+
+    def __init__(self, provider: InputProvider, path: str, dish: str, do_live_annot=False):
+        self.provider = provider
+        self.interactive = provider.interactive
+        self.path = path
+        self.session = {"version": 1, "dish": dish, "annot": do_live_annot, "answers": []}
+
+    def next(self, step: str, query: str, ref=""):
+        answer = self.provider.next(step, query, ref)
+        self.session["answers"].append({"step": step, "query": query, "answer": answer})
+        return answer
+
+    def reject(self, msg: str):
+        if self.session["answers"]:
+            self.session["answers"][-1]["rejected"] = msg
+        self.provider.reject(msg)
+
+    def close(self):
+        '''Write the session file'''
+        with open(self.path, "w", encoding="utf8") as f:
+            json.dump(self.session, f, indent=2)
+
+
+class ReplayInput(InputProvider):
+    '''Replay the answers of a recorded session'''
+
+    def __init__(self, answers: List[Dict]):
+        self.answers = deque(answers)
+        self.last = None
+
+    @staticmethod
+    def load_session(path: str):
+        '''Load a session file written by RecordingInput'''
+        with open(path, "r", encoding="utf8") as f:
+            session = json.load(f)
+        if not isinstance(session, dict) or not known_dish(session.get("dish")):
+            raise RecppError(f"{path} is not a recpp session file")
+        return session
+
+    def next(self, step: str, query: str, ref=""):
+        if not self.answers:
+            raise RecppError(f"session ended before '{query}' ({step})")
+        self.last = self.answers.popleft()
+        if self.last["step"] != step:
+            raise RecppError(f"session diverges at '{query}' ({step}), recorded step is {self.last['step']}")
+        return self.last["answer"]
+
+    def reject(self, msg: str):
+        '''Rejected answers are replayed only if they were rejected when recorded'''
+        if "rejected" not in self.last:
+            raise RecppError(f"invalid answer '{self.last['answer']}' for '{self.last['query']}': {msg}")
+
+
+class StepGuard(object):
+    '''
+    Condition on the cook state compiled from the "when" clause of a
+    metastep or a step e.g. {"classattr.type": ["concrete"]}
+
+    Each attribute path must hold one of the listed values, the first
+    item of a path is a cook attribute, the next ones are dict keys
+    '''
+
+    def __init__(self, when: Dict):
+        self.conds = {}
+        for path, values in (when or {}).items():
+            if not isinstance(values, (list, tuple)):
+                raise RecppError(f"guard on '{path}' expects a list of values")
+            self.conds[path] = (path.split("."), values)
+
+    def __bool__(self):
+        return bool(self.conds)
+
+    def reachable(self, parent=None):
+        '''Check if the guard can hold (alone and together with a parent guard)'''
+        for path, (_, values) in self.conds.items():
+            if not values:
+                return False
+            if parent and path in parent.conds and \
+                    not any(v in parent.conds[path][1] for v in values):
+                return False
+        return True if parent is None else parent.reachable()
+
+    def __call__(self, cook):
+        for keys, values in self.conds.values():
+            value = getattr(cook, keys[0], None)
+            for key in keys[1:]:
+                value = value.get(key) if isinstance(value, dict) else getattr(value, key, None)
+            if value not in values:
+                return False
+        return True
+
+
+class DecisionTree(object):
+    '''
+    Decision tree compiled from the "decision" clause of a step
+
+    A node is either:
+    - a flag question: {"feature", "query", "yes": node, "no": node}, a missing
+      branch decides nothing,
+    - a choice question: {"feature", "query", "choices": {value: node}, "default"},
+    - a list of flag questions tried in order: {"cases": [flag questions], "else": node},
+    - a leaf setting cook attributes: {"set": {attribute: value}}.
+    '''
+
+    def __init__(self, node: Dict):
+        # Question features (name: "flag" or "choice")
+        self.features = {}
+        self.root = self.compile(node)
+
+    def compile(self, node):
+        '''Compile a node into ("leaf", items), ("flag", feature, query, yes, no) or ("choice", feature, query, nodes, default)'''
+        if node is None:
+            return ("leaf", ())
+        if "set" in node:
+            return ("leaf", tuple(node["set"].items()))
+        if "cases" in node:
+            root = self.compile(node.get("else"))
+            for case in reversed(node["cases"]):
+                root = self.compile_question(dict(case, no=None), root)
+            return root
+        return self.compile_question(node)
+
+    def compile_question(self, node: Dict, no=None):
+        feature = node.get("feature")
+        if not feature or "query" not in node:
+            raise RecppError(f"decision node {node} has no feature or query")
+
+        kind = "choice" if "choices" in node else "flag"
+        if self.features.setdefault(feature, kind) != kind:
+            raise RecppError(f"decision feature '{feature}' is both a flag and a choice")
+
+        if kind == "choice":
+            default = node.get("default", "")
+            if default not in node["choices"]:
+                raise RecppError(f"default of decision feature '{feature}' is not a choice")
+            return ("choice", feature, node["query"],
+                    {k: self.compile(v) for k, v in node["choices"].items()}, default)
+
+        return ("flag", feature, node["query"], self.compile(node.get("yes")),
+                no if no is not None else self.compile(node.get("no")))
+
+    def __call__(self, cook, ref: str):
+        '''Walk the tree prompting the user (step callback)'''
+        node = self.root
+        while node[0] != "leaf":
+            if node[0] == "flag":
+                node = node[3] if cook.generic_yesno_input(node[2], ref) else node[4]
+            else:
+                node = node[3][cook.generic_choice_input(node[2], ref, list(node[3]), node[4])]
+
+        for k, v in node[1]:
+            setattr(cook, k, v)
+
+    def feature_value(self, feature: str, value):
+        '''Normalize the value of a feature in a feature vector'''
+        if self.features[feature] == "choice":
+            return "" if value is None else str(value)
+        if isinstance(value, str):
+            if value.strip().lower() not in _recpp_flags:
+                raise RecppError(f"expecting one of {'/'.join(_recpp_flags)} for feature '{feature}'")
+            return value.strip().lower() in _recpp_flags[0:3]
+        return bool(value)
+
+    def evaluate(self, features: Dict):
+        '''
+        Walk the tree without prompting
+        :param features: feature vector (feature: value), a missing flag is false
+                         and a missing choice takes the default value
+        :return: decided attributes
+        '''
+        node = self.root
+        while node[0] != "leaf":
+            if node[0] == "flag":
+                node = node[3] if self.feature_value(node[1], features.get(node[1])) else node[4]
+            else:
+                choice = self.feature_value(node[1], features.get(node[1], node[4]))
+                if choice not in node[3]:
+                    raise RecppError(f"expecting one of {'/'.join(node[3])} for feature '{node[1]}'")
+                node = node[3][choice]
+        return dict(node[1])
+
+# ---------------------------------------------
+# Profiling
+# ---------------------------------------------
+
+
+class NullProfiler(object):
+    '''Profiling hook that records nothing (default hook of cooks)'''
+
+    def stage(self, cat: str, name: str, **args):
+        return self
+
+    def timed(self, cat: str, name: str, chunks):
+        return chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class Profiler(NullProfiler):
+    '''
+    Record the wall time and memory allocations of the stages of a run
+    (recipe load, metasteps, steps, template lookup, render, file write)
+
+    Stages are recorded as chrome trace complete events (see chrome://tracing).
+    Time spent waiting on user input is recorded as "input" stages and is
+    excluded from the wall time of the enclosing stages, time spent rendering
+    the chunks of a streamed file is excluded from its "write" stage.
+    '''
+
+    def __init__(self, trace_alloc=True):
+        '''
+        Constructor
+        :param trace_alloc: set to True to record allocations (tracemalloc)
+        '''
+        import tracemalloc
+        self.tracemalloc = tracemalloc if trace_alloc else None
+        self.started = trace_alloc and not tracemalloc.is_tracing()
+        if self.started:
+            tracemalloc.start()
+        self.pid = os.getpid()
+        self.events = []
+        # Excluded time (category: us) of each open stage
+        self.stack = []
+
+    def close(self):
+        if self.started:
+            self.tracemalloc.stop()
+            self.started = False
+
+    @staticmethod
+    def now():
+        return time.perf_counter() * 1e6
+
+    def allocated(self):
+        return self.tracemalloc.get_traced_memory()[0] if self.tracemalloc else 0
+
+    def record(self, cat: str, name: str, start: float, dur: float, alloc: int, excluded: Dict, args: Dict):
+        args = dict(args)
+        args["wall_ms"] = round((dur - sum(excluded.values())) / 1000, 3)
+        args.update({f"{k}_ms": round(v / 1000, 3) for k, v in excluded.items()})
+        args["alloc_bytes"] = self.allocated() - alloc
+        self.events.append({"name": name, "cat": cat, "ph": "X", "ts": round(start, 3), "dur": round(dur, 3),
+                            "pid": self.pid, "tid": 0, "args": args})
+
+    @contextmanager
+    def stage(self, cat: str, name: str, **args):
+        '''
+        Record a stage
+        :param cat: stage category (load, metastep, step, input, template, render, write...)
+        :param name: stage name
+        :param args: extra values stored in the trace event
+        '''
+        start, alloc = Profiler.now(), self.allocated()
+        excluded = {}
+        self.stack.append(excluded)
+        try:
+            yield self
+        finally:
+            self.stack.pop()
+            dur = Profiler.now() - start
+            if cat == "input":
+                for parent in self.stack:
+                    parent["input"] = parent.get("input", 0.) + dur
+            self.record(cat, name, start, dur, alloc, excluded, args)
+
+    def timed(self, cat: str, name: str, chunks):
+        '''
+        Record the time spent producing the items of an iterable (e.g. rendered chunks)
+        as a single stage excluded from the enclosing stage
+        '''
+        start, total, alloc = None, 0., self.allocated()
+        it = iter(chunks)
+        while True:
+            t = Profiler.now()
+            start = t if start is None else start
+            try:
+                chunk = next(it)
+            except StopIteration:
+                break
+            finally:
+                total += Profiler.now() - t
+            yield chunk
+
+        self.record(cat, name, start, total, alloc, {}, {})
+        if self.stack:
+            self.stack[-1][cat] = self.stack[-1].get(cat, 0.) + total
+
+    def summary(self):
+        '''Wall time and allocations per stage category'''
+        summary = {}
+        for e in self.events:
+            s = summary.setdefault(e["cat"], {"count": 0, "wall_ms": 0., "alloc_bytes": 0})
+            s["count"] += 1
+            s["wall_ms"] = round(s["wall_ms"] + e["args"]["wall_ms"], 3)
+            s["alloc_bytes"] += e["args"]["alloc_bytes"]
+        return summary
+
+    def dump(self, path: str):
+        '''Write the recorded stages to a chrome trace file'''
+        with open(path, "w", encoding="utf8") as f:
+            json.dump({"traceEvents": sorted(self.events, key=lambda e: (e["pid"], e["ts"])),
+                       "displayTimeUnit": "ms",
+                       "otherData": {"summary": self.summary()}}, f, indent=1)
+
+# ---------------------------------------------
+# Annotations
+# ---------------------------------------------
+
+
+class AnnotationType(IntFlag):
+    '''Annotation type tokens as bit flags'''
+    ALL = 1 << 0  # "*": general annotation
+    REF = 1 << 1
+    REL = 1 << 2
+    PERF = 1 << 3
+    MAINT = 1 << 4
+    USA = 1 << 5
+    TEST = 1 << 6
+    COMP = 1 << 7
+    EXT = 1 << 8
+    INTEROP = 1 << 9
+    SEC = 1 << 10
+    CORRECT = 1 << 11
+    PORT = 1 << 12
+    CON = 1 << 13
+    NOTE = 1 << 14
+    TIPS = 1 << 15
+    OTHER = 1 << 16  # token of an extended recipe not listed above
+
+    @staticmethod
+    def token_bit(token: str):
+        if token == "*":
+            return AnnotationType.ALL.value
+        member = AnnotationType.__members__.get(token)
+        return member.value if member is not None and token != "OTHER" else AnnotationType.OTHER.value
+
+    @staticmethod
+    def mask(tokens):
+        '''Get the bit set of a list of type tokens'''
+        mask = 0
+        for t in tokens:
+            mask |= AnnotationType.token_bit(t)
+        return mask
+
+
+class Annotation(object):
+    '''
+    Recipe annotation shared by the cooks, the annotation index and the templates
+
+    Strings are interned (annotations repeat the same references and tips across
+    recipes) and the type tokens are compiled into an AnnotationType bit set, the
+    type string is kept as written in the recipe for display. An annotation
+    can hold a regex check matching C++ code that breaks it (see lint mode).
+    '''
+
+    __slots__ = ("type", "ref", "msg", "types", "check")
+
+    def __init__(self, type: str, ref: str, msg: str, check=""):
+        self.type = sys.intern(type)
+        self.ref = sys.intern(ref)
+        self.msg = sys.intern(msg)
+        self.types = AnnotationType.mask(self.tokens())
+        self.check = check
+
+    @classmethod
+    def from_dict(cls, desc: Dict):
+        return cls(desc["type"], desc["ref"], desc["msg"], desc.get("check", ""))
+
+    def to_dict(self):
+        # The lint check is internal to lint mode, it is not part of the annotation records
+        return {"type": self.type, "ref": self.ref, "msg": self.msg}
+
+    @staticmethod
+    def split(tokens: str):
+        return [t.strip() for t in tokens.split(",") if t.strip()]
+
+    def tokens(self):
+        '''Get the type tokens'''
+        return Annotation.split(self.type)
+
+    def refs(self):
+        '''Get the references'''
+        return Annotation.split(self.ref)
+
+    def key(self):
+        '''Identity of the annotation when annotations of many recipes are merged'''
+        others = frozenset(t for t in self.tokens() if AnnotationType.token_bit(t) == AnnotationType.OTHER) \
+            if self.types & AnnotationType.OTHER else frozenset()
+        return (self.types, others, frozenset(self.refs()), self.msg.strip().lower())
+
+    def __reduce__(self):
+        # Strings are interned again when a compiled cookbook is loaded
+        return (Annotation, (self.type, self.ref, self.msg, self.check))
+
+    def __repr__(self):
+        return f"Annotation({self.type!r}, {self.ref!r}, {self.msg!r})"
+
+# ---------------------------------------------
+# Annotation query engine
+# ---------------------------------------------
+
+
+class AnnotationIndex(object):
+    '''
+    Inverted index over the annotations of a set of recipes
+
+    Annotations repeated across dishes are stored once and indexed on
+    exact type tokens, on reference prefixes (cppcore, cppcore.ES, cppcore.ES.47)
+    and on message words
+    '''
+
+    def __init__(self, recipes: Dict):
+        '''
+        Constructor
+        :param recipes: recipes to index (dish: recipe description)
+        '''
+        self.annotations = []
+        self.dishes = []
+        self.types = {}
+        self.masks = []
+        self.refs = {}
+        self.words = {}
+        self.lengths = []
+
+        seen = {}
+        for dish, rec in recipes.items():
+            for meta in rec:
+                for annot in meta["annotations"]:
+                    key = annot.key()
+                    doc = seen.get(key)
+                    if doc is None:
+                        doc = seen[key] = len(self.annotations)
+                        self.add(annot)
+                    if dish not in self.dishes[doc]:
+                        self.dishes[doc].append(dish)
+
+        self.all = set(range(len(self.annotations)))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.
+
+    def add(self, annot: Annotation):
+        '''Index a new annotation'''
+        doc = len(self.annotations)
+        self.annotations.append(annot)
+        self.dishes.append([])
+        self.masks.append(annot.types)
+
+        for t in annot.tokens():
+            self.types.setdefault(t, set()).add(doc)
+
+        for ref in annot.refs():
+            parts = ref.split(".")
+            for i in range(1, len(parts) + 1):
+                self.refs.setdefault(".".join(parts[:i]), set()).add(doc)
+
+        words = _recpp_word_regex.findall(annot.msg.lower())
+        for w in words:
+            tf = self.words.setdefault(w, {})
+            tf[doc] = tf.get(doc, 0) + 1
+        self.lengths.append(len(words))
+
+    def lookup(self, term: str):
+        '''
+        Get the annotations matching a single query term
+
+        A term is either a type token (PERF), a reference prefix (cppcore.ES, CERT.*, EMCPP)
+        or a message word (lambda), the kind can be forced with a type:, ref: or msg: prefix
+        '''
+        if term == "*":
+            return self.all
+
+        kind, sep, value = term.partition(":")
+        if not sep or kind not in ["type", "ref", "msg"]:
+            kind, value = self.term_kind(term), term
+
+        if kind == "type":
+            return self.types.get(value, set())
+        if kind == "ref":
+            return self.refs.get(value[:-2] if value.endswith(".*") else value.rstrip("*"), set())
+        return set(self.words.get(value.lower(), {}))
+
+    def term_kind(self, term: str):
+        if term in self.types:
+            return "type"
+        if term.endswith("*") or "." in term or term in self.refs:
+            return "ref"
+        if term.isupper():
+            return "type"
+        return "msg"
+
+    def query(self, query: str, keep=0):
+        '''
+        Get the annotations matching a boolean query
+
+        Terms are combined with AND, OR, NOT and parentheses, adjacent terms
+        are implicitly combined with AND and commas are shorthand for OR
+        e.g. PERF AND CON NOT MAINT, PERF,REL, (CERT.* OR cppcore.ES) lambda
+        :param keep: type bit set of the annotations kept whatever the query
+        :return: list of annotations in recipe order
+        '''
+        tokens = _recpp_query_token_regex.findall(query)
+        mask = self.type_mask(tokens)
+        if mask:
+            # Union of type tokens (the usual -k PERF,REL): a single pass on the type bit sets
+            mask |= keep
+            return [annot for annot, types in zip(self.annotations, self.masks) if types & mask]
+        return self.select(self.match(tokens) | self.with_types(keep))
+
+    def with_types(self, mask: int):
+        '''Get the set of annotation ids having one of the types of a bit set'''
+        return {doc for doc, types in enumerate(self.masks) if types & mask} if mask else set()
+
+    def type_mask(self, tokens: List[str]):
+        '''Get the type bit set of query tokens that are a union of type tokens, 0 for any other query'''
+        if len(tokens) % 2 == 0 or any(sep not in ["OR", ","] for sep in tokens[1::2]):
+            return 0
+
+        mask = 0
+        for term in tokens[0::2]:
+            kind, sep, value = term.partition(":")
+            if sep and kind == "type":
+                term = value
+            elif sep or self.term_kind(term) != "type":
+                return 0
+            bit = AnnotationType.token_bit(term)
+            if term == "*" or bit == AnnotationType.OTHER:
+                return 0
+            mask |= bit
+        return mask
+
+    def select(self, docs):
+        '''Get annotations from a set of annotation ids in recipe order'''
+        return [self.annotations[doc] for doc in sorted(docs)]
+
+    def match(self, query):
+        '''Get the set of annotation ids matching a boolean query (or its tokens)'''
+        tokens = _recpp_query_token_regex.findall(query) if isinstance(query, str) else query
+        if not tokens:
+            return self.all
+
+        pos, docs = self.parse_or(tokens, 0)
+        if pos != len(tokens):
+            raise RecppError(f"unexpected '{tokens[pos]}' in annotation query")
+        return docs
+
+    def parse_or(self, tokens: List[str], pos: int):
+        pos, docs = self.parse_and(tokens, pos)
+        while pos < len(tokens) and tokens[pos] in ["OR", ","]:
+            pos, rhs = self.parse_and(tokens, pos + 1)
+            docs = docs | rhs
+        return pos, docs
+
+    def parse_and(self, tokens: List[str], pos: int):
+        pos, docs = self.parse_not(tokens, pos)
+        while pos < len(tokens) and tokens[pos] not in ["OR", ",", ")"]:
+            if tokens[pos] == "AND":
+                pos += 1
+            pos, rhs = self.parse_not(tokens, pos)
+            docs = docs & rhs
+        return pos, docs
+
+    def parse_not(self, tokens: List[str], pos: int):
+        if pos >= len(tokens):
+            raise RecppError("unexpected end of annotation query")
+
+        token = tokens[pos]
+        if token == "NOT":
+            pos, docs = self.parse_not(tokens, pos + 1)
+            return pos, self.all - docs
+        if token == "(":
+            pos, docs = self.parse_or(tokens, pos + 1)
+            if pos >= len(tokens) or tokens[pos] != ")":
+                raise RecppError("missing ')' in annotation query")
+            return pos + 1, docs
+        if token in ["AND", "OR", ",", ")"]:
+            raise RecppError(f"unexpected '{token}' in annotation query")
+        return pos + 1, self.lookup(token)
+
+    def search(self, text: str, docs=None, k1=1.2, b=0.75):
+        '''
+        Full-text search in annotation messages ranked by relevance (BM25)
+        :param text: free text
+        :param docs: set of annotation ids to search in (default: all)
+        :return: list of annotations sorted by decreasing relevance
+        '''
+        allowed = self.all if docs is None else docs
+        scores = {}
+        for w in set(_recpp_word_regex.findall(text.lower())):
+            tf = self.words.get(w)
+            if not tf:
+                continue
+            idf = math.log(1. + (len(self.annotations) - len(tf) + 0.5) / (len(tf) + 0.5))
+            for doc, n in tf.items():
+                if doc in allowed:
+                    norm = k1 * (1. - b + b * self.lengths[doc] / self.avg_length)
+                    scores[doc] = scores.get(doc, 0.) + idf * n * (k1 + 1.) / (n + norm)
+
+        return [self.annotations[doc] for doc in sorted(scores, key=lambda d: (-scores[d], d))]
+
+
+def annotation_index(dishes: List[str]):
+    '''Get the annotation index of a list of dishes, rebuilt when the cookbook changes'''
+    recipes = load_cookbook()
+    key = tuple(dishes)
+    cached = _recpp_annotation_indexes.get(key)
+    if cached and cached[0] is recipes:
+        return cached[1]
+
+    index = AnnotationIndex({d: load_recipe(d) for d in dishes})
+    _recpp_annotation_indexes[key] = (recipes, index)
+    return index
+
+# ---------------------------------------------
+# Output targets
+# ---------------------------------------------
+
+
+class Output(object):
+    '''Base class of the targets generated files are written to'''
+
+    def __init__(self):
+        self.written = []
+        self.unchanged = []
+        self.skipped = []
+
+    def write(self, name: str, chunks):
+        '''
+        Write a generated file
+        :param name: file name relative to the target root
+        :param chunks: iterable of text chunks
+        :return: True if the file was written, False if it was unchanged
+        '''
+        raise NotImplementedError
+
+    def skip(self, name: str):
+        '''Record a generated file that is not written'''
+        self.skipped.append(name)
+
+    def close(self):
+        '''Flush the target once all files are written'''
+        pass
+
+    def summary(self):
+        def files(names):
+            return f" ({', '.join(names)})" if names else ""
+        return f"{len(self.written)} written{files(self.written)}, " \
+            f"{len(self.unchanged)} unchanged{files(self.unchanged)}, " \
+            f"{len(self.skipped)} skipped{files(self.skipped)}"
+
+
+class DirectoryOutput(Output):
+    '''
+    Output target writing generated files in a directory
+
+    A file whose content does not change is left untouched (no mtime
+    bump that would trigger a C++ rebuild), a changed file is written
+    to a temporary file then renamed so that a concurrent build never
+    reads a half-written header
+    '''
+
+    def __init__(self, odir: str):
+        super().__init__()
+        self.odir = Path(odir)
+
+    def write(self, name: str, chunks):
+        '''
+        Write a generated file
+        :param name: file name relative to the output dir
+        :param chunks: iterable of text chunks
+        :return: True if the file was written, False if it was unchanged
+        '''
+        import hashlib
+        import tempfile
+
+        path = self.odir / name
+        # The dir is only created once there is something to write in it
+        path.parent.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with open(fd, "wb", buffering=_recpp_write_buffer_size) as f:
+                for chunk in chunks:
+                    data = chunk.replace("\n", os.linesep).encode("utf8") if os.linesep != "\n" else chunk.encode("utf8")
+                    digest.update(data)
+                    size += len(data)
+                    f.write(data)
+
+            if DirectoryOutput.same_content(path, size, digest.digest()):
+                os.unlink(tmp)
+                self.unchanged.append(name)
+                return False
+
+            DirectoryOutput.copy_mode(path, tmp)
+            os.replace(tmp, str(path))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+        self.written.append(name)
+        return True
+
+    @staticmethod
+    def same_content(path: Path, size: int, digest: bytes):
+        import hashlib
+
+        try:
+            if path.stat().st_size != size:
+                return False
+            current = hashlib.sha256()
+            with open(str(path), "rb") as f:
+                for block in iter(partial(f.read, _recpp_write_buffer_size), b""):
+                    current.update(block)
+            return current.digest() == digest
+        except OSError:
+            return False
+
+    @staticmethod
+    def copy_mode(path: Path, tmp: str):
+        '''Give the temporary file the mode of the file it replaces (or the default one)'''
+        try:
+            mode = path.stat().st_mode & 0o7777
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            mode = 0o666 & ~umask
+        os.chmod(tmp, mode)
+
+
+class MemoryOutput(Output):
+    '''Output target keeping generated files in memory (e.g. for tests and library callers)'''
+
+    def __init__(self, files=None):
+        '''
+        Constructor
+        :param files: dict of files (name: code) updated by the target, a new one if None
+        '''
+        super().__init__()
+        self.files = {} if files is None else files
+
+    def write(self, name: str, chunks):
+        code = "".join(chunks)
+        if self.files.get(name) == code:
+            self.unchanged.append(name)
+            return False
+        self.files[name] = code
+        self.written.append(name)
+        return True
+
+
+class ArchiveOutput(Output):
+    '''
+    Output target writing generated files in a single archive (.tar, .tar.gz,
+    .tar.zst with zstandard installed or .zip)
+
+    Files are added to the archive as they are generated, the archive is
+    written to a temporary file renamed over the target path on close
+    '''
+
+    _suffixes = [".tar", ".tar.gz", ".tgz", ".tar.zst", ".tzst", ".zip"]
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = Path(path)
+        self.kind = ArchiveOutput.archive_suffix(path)
+        if not self.kind:
+            raise RecppError(f"unsupported archive type for {path} (expecting {', '.join(ArchiveOutput._suffixes)})")
+        self.mtime = int(os.environ.get("SOURCE_DATE_EPOCH", time.time()))
+        self.files = None
+        self.archive = None
+        self.stream = None
+
+    @staticmethod
+    def archive_suffix(path: str):
+        '''Get the archive suffix of a path or "" if it is not an archive'''
+        return next((s for s in ArchiveOutput._suffixes if str(path).endswith(s)), "")
+
+    def open(self):
+        import tempfile
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self.tmp = tempfile.mkstemp(dir=str(self.path.parent), prefix=f".{self.path.name}.", suffix=".tmp")
+        self.files = open(fd, "wb", buffering=_recpp_write_buffer_size)
+        if self.kind == ".zip":
+            import zipfile
+            self.archive = zipfile.ZipFile(self.files, "w", zipfile.ZIP_DEFLATED)
+            return
+
+        import tarfile
+        fileobj = self.files
+        if self.kind in [".tar.zst", ".tzst"]:
+            try:
+                import zstandard
+            except ImportError:
+                raise RecppError("zstandard is required for .tar.zst archives")
+            self.stream = zstandard.ZstdCompressor().stream_writer(self.files, closefd=False)
+            fileobj = self.stream
+        mode = "w|gz" if self.kind in [".tar.gz", ".tgz"] else "w|"
+        self.archive = tarfile.open(fileobj=fileobj, mode=mode, format=tarfile.PAX_FORMAT)
+
+    def write(self, name: str, chunks):
+        if self.archive is None:
+            self.open()
+
+        if self.kind == ".zip":
+            import zipfile
+            info = zipfile.ZipInfo(name, time.localtime(self.mtime)[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            with self.archive.open(info, "w") as f:
+                for chunk in chunks:
+                    f.write(chunk.encode("utf8"))
+        else:
+            import tarfile
+            data = "".join(chunks).encode("utf8")
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            info.mtime = self.mtime
+            info.mode = 0o644
+            self.archive.addfile(info, io.BytesIO(data))
+
+        self.written.append(name)
+        return True
+
+    def close(self):
+        '''Finish the archive and move it to the target path'''
+        if self.archive is None:
+            return
+        try:
+            self.archive.close()
+            if self.stream:
+                self.stream.close()
+            self.files.close()
+            DirectoryOutput.copy_mode(self.path, self.tmp)
+            os.replace(self.tmp, str(self.path))
+        except BaseException:
+            self.files.close()
+            os.unlink(self.tmp)
+            raise
+        finally:
+            self.archive = None
+
+
+class MergeOutput(Output):
+    '''
+    Output target merging generated files as regions of the files of a directory
+
+    A region is delimited by "// recpp:begin <id>" and "// recpp:end" marker
+    lines, the hand-written code around the regions is left as is:
+    - a missing file is created with the region,
+    - a file without the region gets it appended,
+    - a file with the region gets the region body replaced if it changed.
+
+    Files are scanned for the markers in a single pass through mmap and only
+    the region body is rewritten: in place if its size does not change,
+    otherwise the code around it is copied from the mapping to a temporary
+    file renamed over the target. A file whose region did not change is
+    left untouched.
+    '''
+
+    def __init__(self, odir: str, region=""):
+        '''
+        Constructor
+        :param odir: output dir
+        :param region: id of the merged regions, the generated file name if empty
+        '''
+        super().__init__()
+        self.odir = Path(odir)
+        self.region = region
+        if region and not re.fullmatch(r"\S+", region):
+            raise RecppError(f"invalid region id '{region}' (no whitespace allowed)")
+
+    def write(self, name: str, chunks):
+        '''
+        Merge a generated file
+        :param name: file name relative to the output dir
+        :param chunks: iterable of text chunks
+        :return: True if the file was written, False if its region was unchanged
+        '''
+        body = "".join(chunks)
+        if body and not body.endswith("\n"):
+            body += "\n"
+        path = self.odir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with MergeOutput.locked(path.parent):
+            merged = MergeOutput.merge(path, (self.region or name).encode("utf8"), body.encode("utf8"))
+        (self.written if merged else self.unchanged).append(name)
+        return merged
+
+    @staticmethod
+    @contextmanager
+    def locked(dir: Path):
+        '''Serialize the merges into the files of a dir (e.g. batch workers merging regions of the same file)'''
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        fd = os.open(str(dir), os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def regions(data, path: Path):
+        '''
+        Scan a file content for its regions
+        :param data: file content (bytes or mmap)
+        :param path: file path (for error messages)
+        :return: dict of regions (id: (body start offset, body end offset))
+        '''
+        def error(msg: str, offset: int):
+            line = data[:offset].count(b"\n") + 1
+            return RecppError(f"{path}:{line}: {msg}")
+
+        regions = {}
+        current = None
+        pos = data.find(b"recpp:")
+        while pos >= 0:
+            start = data.rfind(b"\n", 0, pos) + 1
+            end = data.find(b"\n", pos)
+            end = len(data) if end < 0 else end + 1
+            marker = _recpp_marker_regex.fullmatch(data[start:end])
+            if marker:
+                kind, region = marker.groups()
+                if kind == b"begin":
+                    if region is None:
+                        raise error("region without id", start)
+                    if current:
+                        raise error(f"region '{current[0].decode()}' is not closed", start)
+                    if region in regions:
+                        raise error(f"duplicate region '{region.decode()}'", start)
+                    current = (region, end)
+                else:
+                    if not current or region not in [None, current[0]]:
+                        raise error("unmatched region end", start)
+                    regions[current[0]] = (current[1], start)
+                    current = None
+            pos = data.find(b"recpp:", end)
+
+        if current:
+            raise error(f"region '{current[0].decode()}' is not closed", len(data))
+        return regions
+
+    @staticmethod
+    def merge(path: Path, region: bytes, body: bytes):
+        '''
+        Merge a region into a file
+        :param path: file path
+        :param region: region id
+        :param body: region body (utf8 lines)
+        :return: True if the file was written, False if the region was unchanged
+        '''
+        import mmap
+
+        def block(eol: bytes):
+            return b"// recpp:begin " + region + eol + body.replace(b"\n", eol) + b"// recpp:end" + eol
+
+        if not path.exists():
+            MergeOutput.replace(path, [block(os.linesep.encode())])
+            return True
+
+        with open(str(path), "r+b") as f:
+            size = os.fstat(f.fileno()).st_size
+            with (mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else nullcontext(b"")) as data:
+                regions = MergeOutput.regions(data, path)
+                # Generated lines follow the line endings of the file
+                first = data.find(b"\n")
+                eol = os.linesep.encode() if first < 0 else b"\r\n" if data[first - 1:first] == b"\r" else b"\n"
+
+                if region not in regions:
+                    f.seek(0, os.SEEK_END)
+                    f.write((eol if size and data[size - 1:] != b"\n" else b"") + block(eol))
+                    return True
+
+                start, end = regions[region]
+                body = body.replace(b"\n", eol) if eol != b"\n" else body
+                if data[start:end] == body:
+                    return False
+                if end - start == len(body):
+                    f.seek(start)
+                    f.write(body)
+                    return True
+
+                view = memoryview(data)
+                try:
+                    MergeOutput.replace(path, [view[:start], body, view[end:]])
+                finally:
+                    view.release()
+        return True
+
+    @staticmethod
+    def replace(path: Path, parts: list):
+        '''Write the parts of a file to a temporary file renamed over it'''
+        import tempfile
+
+        fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with open(fd, "wb", buffering=_recpp_write_buffer_size) as f:
+                for part in parts:
+                    f.write(part)
+            DirectoryOutput.copy_mode(path, tmp)
+            os.replace(tmp, str(path))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+
+def output_target(odir: str, merge=None):
+    '''
+    Get the output target of an output dir or archive path
+    :param odir: output dir or archive path
+    :param merge: region id (see MergeOutput) to merge the generated files into the files of the dir,
+                  "" for the generated file names, None to write whole files
+    '''
+    if merge is not None:
+        if ArchiveOutput.archive_suffix(odir):
+            raise RecppError(f"cannot merge generated files into an archive ({odir})")
+        return MergeOutput(odir, merge)
+    return ArchiveOutput(odir) if ArchiveOutput.archive_suffix(odir) else DirectoryOutput(odir)
+
+# ---------------------------------------------
+# Render cache
+# ---------------------------------------------
+
+
+def template_sources(env, name: str):
+    '''
+    Get the sources of a template and of all the templates it extends, includes or imports
+    :return: dict (template name: (source or None if it cannot be loaded or parsed, uptodate callable)),
+             a reference to a template computed at render time is stored under None
+    '''
+    from jinja2 import TemplateError, meta
+    sources = {}
+    todo = [name]
+    while todo:
+        name = todo.pop()
+        if name in sources:
+            continue
+        try:
+            source, _, uptodate = env.loader.get_source(env, name)
+            refs = list(meta.find_referenced_templates(env.parse(source)))
+        except TemplateError:
+            sources[name] = (None, None)
+            continue
+        sources[name] = (source, uptodate)
+        if None in refs:
+            sources[None] = (None, None)
+        todo.extend(sorted(ref for ref in refs if ref))
+    return sources
+
+
+def template_refs(source: str):
+    '''
+    Get the templates a template source extends, includes or imports without parsing it
+    :return: list of template names, None if a reference is computed at render time
+    '''
+    refs = []
+    for tag in _recpp_template_ref_regex.finditer(source):
+        literal = _recpp_template_literal_regex.fullmatch(tag.group(1))
+        if not literal:
+            return None
+        refs.append(literal.group(1) if literal.group(1) is not None else literal.group(2))
+    return refs
+
+
+class RenderCache(object):
+    '''
+    Rendered templates memoized on their context and template sources
+
+    A key is the hash of a canonical encoding of the template context and of
+    the sources of the template inheritance chain, so that an edited template
+    never serves a stale render. Renders are kept in a bounded LRU in memory
+    (shared by the threads of the http service) and optionally in a directory
+    shared between processes.
+    '''
+
+    def __init__(self, max_entries=256, disk_dir=None):
+        import threading
+
+        self.max_entries = max_entries
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.chains = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def canonical(value):
+        '''
+        Get the canonical form of a template context value: dicts in key order and
+        annotations as tuples tagged with Ellipsis, other values are kept for marshal
+        that only accepts (exact) builtin types
+        '''
+        t = type(value)
+        if t is dict:
+            return {k: RenderCache.canonical(value[k]) for k in sorted(value)}
+        if t is list:
+            return [RenderCache.canonical(v) for v in value]
+        if t is tuple:
+            return tuple(RenderCache.canonical(v) for v in value)
+        if t is Annotation:
+            return (..., value.type, value.ref, value.msg, value.check)
+        return value
+
+    def chain_digest(self, env, name: str):
+        '''
+        Get the digest of the sources of a template inheritance chain (None if it cannot be cached)
+
+        The chain is found by scanning the raw sources for the template tags rather
+        than by parsing them, parsing costs more than a render (see template_refs).
+        The digest is checked for staleness with the uptodate callables of the loader.
+        '''
+        cached = self.chains.get((id(env), name))
+        if cached and all(uptodate() for uptodate in cached[1]):
+            return cached[0]
+
+        if not env.loader.has_source_access:
+            # Zipapp build, the templates are the ones the bundle was built from
+            bundle = load_bundle()
+            digest = f"{name}:{bundle.digest}" if bundle else None
+            self.chains[(id(env), name)] = (digest, [])
+            return digest
+
+        import hashlib
+        from jinja2 import TemplateError
+        h = hashlib.blake2b(digest_size=20)
+        uptodates = []
+        seen = set()
+        todo = [name]
+        while todo:
+            tpl = todo.pop()
+            if tpl in seen:
+                continue
+            seen.add(tpl)
+            try:
+                source, _, uptodate = env.loader.get_source(env, tpl)
+            except TemplateError:
+                return None
+            refs = template_refs(source)
+            if refs is None:
+                return None
+            h.update(f"{len(tpl)}:{tpl}{len(source)}:{source}".encode("utf8", "surrogatepass"))
+            if uptodate:
+                uptodates.append(uptodate)
+            todo.extend(sorted(refs, reverse=True))
+        digest = h.hexdigest()
+        self.chains[(id(env), name)] = (digest, uptodates)
+        return digest
+
+    def key(self, env, name: str, ctx: Dict):
+        '''Get the cache key of a template render (None if it cannot be cached)'''
+        chain = self.chain_digest(env, name)
+        if chain is None:
+            return None
+        import hashlib
+        import marshal
+        try:
+            data = marshal.dumps(self.canonical(ctx), 2)
+        except (TypeError, ValueError):
+            return None
+        h = hashlib.blake2b(chain.encode(), digest_size=20)
+        h.update(data)
+        return h.hexdigest()
+
+    def get(self, key: str):
+        '''Get a cached render or None'''
+        with self.lock:
+            text = self.entries.get(key)
+            if text is not None:
+                self.entries.move_to_end(key)
+        if text is None and self.disk_dir:
+            try:
+                with open(str(self.disk_dir / key[:2] / key), "rb") as f:
+                    text = zlib.decompress(f.read()).decode("utf8")
+                self.store(key, text)
+            except (OSError, zlib.error, UnicodeDecodeError):
+                text = None
+
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def store(self, key: str, text: str):
+        with self.lock:
+            self.entries[key] = text
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def put(self, key: str, text: str):
+        '''Cache a render'''
+        self.store(key, text)
+        if self.disk_dir:
+            import tempfile
+            path = self.disk_dir / key[:2]
+            try:
+                path.mkdir(parents=True, exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=str(path), suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(zlib.compress(text.encode("utf8"), 1))
+                os.replace(tmp, str(path / key))
+            except OSError:
+                pass
+
+    def collect(self, key: str, chunks):
+        '''Stream the chunks of a render and cache the render once it is complete'''
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.put(key, "".join(parts))
+
+
+def render_cache():
+    '''
+    Get the render cache of the process (None if disabled)
+
+    RECPP_RENDER_CACHE selects the cache: "memory", "disk" to add a layer in
+    the cache dir shared between processes, or "off". The default is "off"
+    for one-shot runs and "memory" for resident modes (see resident_render_cache)
+    '''
+    global _recpp_render_cache
+    if _recpp_render_cache is None:
+        mode = os.environ.get("RECPP_RENDER_CACHE", _recpp_render_cache_mode).lower()
+        if mode in ["off", "0", "no", "false"]:
+            _recpp_render_cache = False
+        else:
+            cdir = cache_dir() if mode == "disk" else None
+            _recpp_render_cache = RenderCache(_recpp_render_cache_size, cdir / "renders" if cdir else None)
+    return _recpp_render_cache or None
+
+
+def resident_render_cache():
+    '''Memoize renders in memory by default, for the modes cooking many dishes in one process (server, http, watch)'''
+    global _recpp_render_cache, _recpp_render_cache_mode
+    _recpp_render_cache_mode = "memory"
+    if _recpp_render_cache is False and "RECPP_RENDER_CACHE" not in os.environ:
+        _recpp_render_cache = None
+
+# ---------------------------------------------
+# Recipe handling classes
+# ---------------------------------------------
+
+
+class RecipeCook(object):
+    '''Base class for cooking recipes'''
+
+    def __init__(self, desc: Dict, template_path=_recpp_template_path):
+        '''
+        Contructor
+        :param desc: Recipe description
+        :template_path: path to the template to patch
+        '''
+        self.env = template_env(template_path)
+        self.desc = desc
+        self.plan = type(self).dispatch_plan(desc)
+        self.annotations = []
+        self.ostream = sys.stdout
+        self.input_provider = InteractiveInput()
+        self.current_step = ""
+        self.profiler = NullProfiler()
+        self.bench = False
+
+    def print_live_annotations(self, annots: List):
+        '''Print live annotation list'''
+        for annot in annots:
+            self.print_live_annotation(annot.type, annot.ref, annot.msg)
+
+        if annots:
+            print("", file=self.ostream)
+
+    def print_live_annotation(self, type, ref, msg):
+        '''Print annotation'''
+        print(f"(!) {type} [{ref}]: {msg}", file=self.ostream)
+
+    def handle_annotations(self, annotations: List[str], do_live_annot: bool):
+        '''
+        Process annotations
+        :param annotations: list of annotations
+        :param do_live_annot: set to True to display annotations during recipe
+        '''
+        if annotations and do_live_annot:
+            self.print_live_annotations(annotations)
+        else:
+            self.annotations.extend(annotations)
+
+    @classmethod
+    def dispatch_plan(cls, desc: List):
+        '''
+        Compile a recipe description into a dispatch plan
+        :param desc: Recipe description
+        :return: list of metasteps with resolved callbacks and compiled guards
+
+        The child class responsible for a dish must implement a callback
+        for each step with the name: metastep_step_id (unless the step is
+        decided by a decision tree given in the recipe), a callback with the
+        name metastep_repeat for each repeatable metastep and optionally
+        callbacks with the names metastep_initialize and metastep_finalize.
+        Steps whose guard can never hold are pruned and a missing callback
+        is reported before any step is cooked.
+        '''
+        key = (cls, id(desc))
+        cached = _recpp_dispatch_plans.get(key)
+        if cached and cached[0] is desc:
+            return cached[1]
+
+        plan = []
+        missing = []
+        for metastep in desc:
+            name = metastep["id"]
+            guard = StepGuard(metastep.get("when"))
+            steps = []
+            for step in metastep["steps"] if guard.reachable() else []:
+                step_name = "_".join([name, "step", step["id"]])
+                step_guard = StepGuard(step.get("when"))
+                if not step_guard.reachable(guard):
+                    continue
+
+                step_exec = DecisionTree(step["decision"]) if "decision" in step else getattr(cls, step_name, None)
+                if not step_exec:
+                    missing.append(step_name)
+                    continue
+                steps.append((step_name, step_exec, step["ref"], step_guard or None))
+
+            repeat = getattr(cls, name + "_repeat", None) if metastep["repeatable"] else None
+            if metastep["repeatable"] and not repeat:
+                missing.append(name + "_repeat")
+
+            plan.append({
+                "id": name,
+                "desc": metastep["desc"],
+                "annotations": metastep["annotations"],
+                "when": guard or None,
+                "reachable": guard.reachable(),
+                "repeat": repeat,
+                "initialize": getattr(cls, name + "_initialize", None),
+                "finalize": getattr(cls, name + "_finalize", None),
+                "steps": steps
+            })
+
+        if missing:
+            raise RecppError(f"{', '.join(missing)} not implemented in {cls.__name__}")
+
+        _recpp_dispatch_plans[key] = (desc, plan)
+        return plan
+
+    def cook(self, do_live_annot: bool):
+        '''
+        Process a recipe
+        :param do_live_annot: set to True to display live annotation
+        '''
+        self.annotations = []
+        for metastep in self.plan:
+            with self.profiler.stage("metastep", metastep["id"]):
+                self.cook_metastep(metastep, do_live_annot)
+
+    def cook_metastep(self, metastep: Dict, do_live_annot: bool):
+        '''
+        Process a metastep of the dispatch plan
+        :param metastep: compiled metastep
+        :param do_live_annot: set to True to display live annotation
+        '''
+        if self.input_provider.interactive:
+            print(f"\n~~~ Recipe step - {metastep['desc']} ~~~\n", file=self.ostream)
+        self.handle_annotations(metastep["annotations"], do_live_annot)
+
+        if not metastep["reachable"] or (metastep["when"] and not metastep["when"](self)):
+            return
+
+        loop_count = 1
+        if metastep["repeat"]:
+            self.current_step = metastep["id"] + "_repeat"
+            with self.profiler.stage("step", self.current_step):
+                loop_count = metastep["repeat"](self)
+
+        for i in range(0, loop_count):
+            if loop_count > 1 and self.input_provider.interactive:
+                print(f"\n~~~ Repeat count - {i+1} ~~~\n", file=self.ostream)
+            if metastep["initialize"]:
+                metastep["initialize"](self)
+            for name, step_exec, ref, guard in metastep["steps"]:
+                if guard is None or guard(self):
+                    self.current_step = name
+                    with self.profiler.stage("step", name):
+                        step_exec(self, ref)
+            if metastep["finalize"]:
+                metastep["finalize"](self)
+
+    def serve_dish(self, odir):
+        '''
+        Serve dish
+        :param odir: output dir, archive path or Output target
+
+        If no output dir is given, dish is served on console
+        :return: output target or None if served on console
+        '''
+        if not odir:
+            with self.profiler.stage("serve", "console"):
+                self.show_dish_console()
+            return None
+
+        output = odir if isinstance(odir, Output) else output_target(odir)
+        self.write_dish(output)
+        output.close()
+        print_msg(output.summary(), "INFO", file=self.ostream)
+        return output
+
+    def show_dish_console(self):
+        print("\n" + _recpp_dish_served, file=self.ostream)
+        self.show_dish_console_impl()
+
+    def render_dish(self):
+        '''
+        Render the dish templates
+        :return: dict of rendered files (name: code)
+        '''
+        return {name: "".join(self.render_chunks(tpl, ctx))
+                for name, tpl, ctx in self.dish_templates()}
+
+    def dish_text(self):
+        '''Get the dish as it is served on console (without banner)'''
+        ostream, self.ostream = self.ostream, io.StringIO()
+        try:
+            self.show_dish_console_impl()
+            return self.ostream.getvalue()
+        finally:
+            self.ostream = ostream
+
+    def suggestion(self):
+        '''
+        Get the suggestion of a decision making dish
+        :return: dict of decided attributes (empty for code generating dishes)
+        '''
+        return {}
+
+    def show_dish_console_impl(self):
+        '''Stream the rendered dish templates on console'''
+        for i, (_, tpl, ctx) in enumerate(self.dish_templates()):
+            if i:
+                self.ostream.write("\n")
+            self.render_stream(tpl, ctx, self.ostream)
+            self.ostream.write("\n")
+
+    def dish_templates(self):
+        '''
+        Get the templates that render the dish
+        :return: list of (file name, template name, template context)
+        '''
+        return []
+
+    def write_dish(self, output: Output):
+        '''Stream the rendered dish templates to an output target'''
+        for name, tpl, ctx in self.dish_templates():
+            chunks = self.render_chunks(tpl, ctx)
+            with self.profiler.stage("write", name):
+                output.write(name, chunks)
+
+    def skip_dish(self, output: Output):
+        '''Serve on console a dish that has nothing to write'''
+        self.show_dish_console()
+        print_msg("This recipe has nothing to write to disk", "WARN", file=self.ostream)
+        for name, _, _ in self.dish_templates():
+            output.skip(name)
+
+    def render_stream(self, tpl: str, ctx: Dict, f):
+        '''
+        Render a template chunk by chunk into a writer
+        :param tpl: template name
+        :param ctx: template context
+        :param f: text writer
+        '''
+        for chunk in self.render_chunks(tpl, ctx):
+            f.write(chunk)
+
+    def render_chunks(self, tpl: str, ctx: Dict):
+        '''
+        Render a template lazily, chunk by chunk
+        :param tpl: template name
+        :param ctx: template context
+        :return: iterable of chunks, a single chunk when the same context was
+                 already rendered with the same template sources (see RenderCache)
+        '''
+        cache = render_cache()
+        if cache:
+            with self.profiler.stage("cache", tpl):
+                key = cache.key(self.env, tpl, ctx)
+                text = cache.get(key) if key else None
+            if text is not None:
+                return [text]
+
+        with self.profiler.stage("template", tpl):
+            template = self.env.get_template(tpl)
+        chunks = self.profiler.timed("render", tpl, template.generate(ctx))
+        return cache.collect(key, chunks) if cache and key else chunks
+
+    @staticmethod
+    def format_input(query: str, ref: str):
+        return query + (f" [ref: {ref}]" if ref else "")
+
+    def custom_input(self, query: str, ref=""):
+        '''Get the answer to a prompt from the input provider'''
+        if not self.input_provider.interactive:
+            return self.input_provider.next(self.current_step, query, ref)
+        with self.profiler.stage("input", self.current_step):
+            return self.input_provider.next(self.current_step, query, ref)
+
+    def input_error(self, msg: str):
+        '''Report an invalid input'''
+        print_msg(msg, file=self.ostream)
+        self.input_provider.reject(msg)
+
+    @strong_input(InputType.FLAG)
+    def generic_yesno_input(self, query, ref):
+        return self.custom_input(f"{query} (y/n)", ref)
+
+    @strong_input(InputType.IDENTIFIER)
+    def generic_identifier_input(self, query, ref):
+        return self.custom_input(query, ref)
+
+    @strong_input(InputType.TYPE)
+    def generic_type_input(self, query, ref):
+        return self.custom_input(f"{query} (default: auto)", ref)
+
+    @strong_input(InputType.MISC)
+    def generic_misc_input(self, query, ref):
+        return self.custom_input(f"{query}", ref)
+
+    def generic_choice_input(self, query, ref, choices: List[str], default: str):
+        return strong_input(InputType.LIST, choices, default)(RecipeCook.custom_input)(self, query, ref)
+
+
+class DesignRecipeCook(RecipeCook):
+    '''Recipe to help you design'''
+
+    def __init__(self, desc, template_path=_recpp_template_path):
+        super().__init__(desc, template_path)
+        self.pattern = ""
+
+    def show_dish_console_impl(self):
+        self.print_live_annotations(self.annotations)
+        print_msg(f"You could consider the following patterns in your design -> {self.pattern}", "SUGGEST", file=self.ostream)
+
+    def suggestion(self):
+        return {"pattern": self.pattern}
+
+    def write_dish(self, output: Output):
+        self.skip_dish(output)
+
+
+class ClassRecipeCook(RecipeCook):
+    '''Recipe to generate a class'''
+
+    def __init__(self, desc, template_path=_recpp_template_path):
+        super().__init__(desc, template_path)
+        self.classattr = {}
+        self.has_impl = False
+
+    def dish_templates(self):
+        self.classattr["annotations"] = self.annotations
+        files = [f"{self.classattr['type']}_class.h"]
+        if self.has_impl:
+            files.append(f"{self.classattr['type']}_class.cpp")
+        return [(f, f, self.classattr) for f in files]
+
+    def class_root_step_name(self, ref):
+        self.classattr["classname"] = self.generic_identifier_input(
+            "Enter class name", ref)
+
+    def class_root_step_responsability(self, ref):
+        self.classattr["responsability"] = self.custom_input(
+            "Enter class single role/responsability", ref)
+
+    def class_root_step_invariant(self, ref):
+        self.classattr["invariant"] = self.custom_input(
+            "Enter class invariants description", ref)
+
+    @strong_input(InputType.LIST, ["thread-safe", "thread-compatible", "thread-incompatible"], "thread-incompatible")
+    def root_step_thread_safe_cb(self, ref):
+        return self.custom_input("Enter thread-safety contrat (thread-safe: no api race, thread-compatible: no api race if not mutated, thread-incompatible, default: thread-incompatible)", ref)
+
+    def class_root_step_thread_safe(self, ref):
+        self.classattr["thread_safety"] = self.root_step_thread_safe_cb(ref)
+
+    @strong_input(InputType.LIST, ["concrete", "hierarchy"], "concrete")
+    def class_root_step_type_cb(self, ref):
+        return self.custom_input("Enter class type (concrete, hierarchy, default: concrete)", ref)
+
+    def class_root_step_type(self, ref):
+        self.classattr["type"] = self.class_root_step_type_cb(ref)
+
+    @strong_input(InputType.INT)
+    def tpl_parameters_repeat(self):
+        return self.custom_input("Enter template parameters count")
+
+    def tpl_parameters_initialize(self):
+        self.tparam = {}
+
+    def tpl_parameters_step_name(self, ref):
+        self.tparam["name"] = self.generic_misc_input(
+            "Enter template parameter full desc e.g. typename T, ...", ref)
+
+    def tpl_parameters_finalize(self):
+        self.classattr.setdefault("tparams", []).append(
+            copy.deepcopy(self.tparam))
+
+    @strong_input(InputType.LIST, ["thin", "thick", "verythick"], "thin")
+    def concrete_step_abstraction_cb(self, ref):
+        return self.custom_input("Enter class abstraction (verythick for pimpl, thick for no-inline, thin otherwise, default: thin)", ref)
+
+    def concrete_step_abstraction(self, ref):
+        if "tparams" in self.classattr:
+            self.classattr["abstraction"] = "thin"
+        else:
+            self.classattr["abstraction"] = self.concrete_step_abstraction_cb(
+                ref)
+
+        self.has_impl = (self.classattr["abstraction"] == "verythick")
+
+    def concrete_step_raii(self, ref):
+        if self.classattr["abstraction"] == "verythick":
+            # Force raii attribute
+            self.classattr["raii"] = False
+        else:
+            self.classattr["raii"] = self.generic_yesno_input(
+                "Does the class acquire-release a resource at contruction/destruction", ref)
+
+    def concrete_step_specials(self, ref):
+        if self.classattr["abstraction"] == "verythick" or self.classattr["raii"]:
+            self.classattr["specials"] = True
+        else:
+            self.classattr["specials"] = self.generic_yesno_input(
+                "Should one of the special members be defined", ref)
+
+    def concrete_step_alloc(self, ref):
+        self.classattr["custom_allocators"] = self.generic_yesno_input(
+            "Does the class need custom allocation/deallocation overloads", ref)
+
+    def concrete_step_init_list_ctor(self, ref):
+        self.classattr["init_list_ctor"] = self.generic_yesno_input(
+            "Does the class need an initializer list ctor", ref)
+
+    def hierarchy_step_base(self, ref):
+        self.classattr["base"] = self.generic_yesno_input(
+            "Is it the base class in hierarchy", ref)
+
+        if not self.classattr["base"]:
+            self.classattr["basename"] = self.custom_input(
+                "Enter the main base class name", ref)
+
+    def hierarchy_step_clonable(self, ref):
+        self.classattr["clonable"] = self.generic_yesno_input(
+            "Is is part of a clonable hierarchy", ref)
+
+    def hierarchy_step_interface(self, ref):
+        if self.classattr["base"]:
+            self.classattr["interface"] = self.generic_yesno_input(
+                "Does the hierarchy need a complete separation of interface", ref)
+
+    def hierarchy_step_inherited_init(self, ref):
+        if not self.classattr["base"]:
+            self.classattr["init_with_base"] = not self.generic_yesno_input(
+                "Does the class need specific initialization (data members, ...)", ref)
+
+
+class FunctionRecipeCook(RecipeCook):
+    '''Recipe to generate a function'''
+
+    def __init__(self, desc, template_path=_recpp_template_path):
+        super().__init__(desc, template_path)
+        self.funcattr = {}
+        self.param = {}
+        self.tparam = {}
+        self.ret = {}
+        self.attr = {}
+        self.virtual = False
+
+    def dish_templates(self):
+        self.funcattr["annotations"] = self.annotations
+        files = ["function.h"]
+        # Opt-in microbenchmark, a method would need an object the generator knows nothing about
+        if self.bench and self.funcattr.get("type") == "free":
+            files.append("function_bench.cpp")
+        return [(f, f, self.funcattr) for f in files]
+
+    def func_root_step_name(self, ref):
+        self.funcattr["name"] = self.generic_identifier_input(
+            "Enter function name", ref)
+
+    def func_root_step_type(self, ref):
+        if self.generic_yesno_input("Is it a virtual method", ref):
+            self.funcattr["type"] = "method"
+            self.virtual = True
+        elif self.generic_yesno_input("Does it need access to a class internal representation aka a method", ref):
+            self.funcattr["type"] = "method"
+            self.virtual = False
+        else:
+            self.funcattr["type"] = "free"
+
+    def func_root_step_responsability(self, ref):
+        self.funcattr["responsability"] = self.custom_input(
+            "Enter function single role/responsability", ref)
+
+    def func_root_step_thread_safe(self, ref):
+        self.funcattr["thread_hostile"] = self.generic_yesno_input(
+            "Can it cause API races at sites other than its inputs (e.g. static local variable)", ref)
+
+    @strong_input(InputType.INT)
+    def tpl_parameters_repeat(self):
+        return "0" if self.virtual else self.custom_input("Enter template parameters count")
+
+    def tpl_parameters_initialize(self):
+        self.tparam = {}
+
+    def tpl_parameters_step_name(self, ref):
+        self.tparam["name"] = self.generic_misc_input(
+            "Enter template parameter full desc e.g. typename T, ...", ref)
+
+    def tpl_parameters_finalize(self):
+        self.funcattr.setdefault("tparams", []).append(
+            copy.deepcopy(self.tparam))
+
+    @strong_input(InputType.INT)
+    def func_parameters_repeat(self):
+        return self.custom_input("Enter regular parameters count")
+
+    def func_parameters_initialize(self):
+        self.param = {}
+        self.param.setdefault("comments", [])
+
+    def func_parameters_step_name(self, ref):
+        self.param["name"] = self.generic_identifier_input(
+            "Enter parameter name (without type)", ref)
+
+    def func_parameters_step_type_react(self, ref, msg):
+        self.print_live_annotation("TIPS", ref, msg)
+        if self.generic_yesno_input("Would you like to update param type according to tips", ref):
+            self.param["type"] = self.generic_type_input(
+                f"Enter parameter type to replace {self.param['type']}", ref)
+
+    def func_parameters_step_type(self, ref):
+        self.param["type"] = self.generic_type_input(
+            "Enter parameter type e.g. int, const Obj&, ...", ref)
+
+        if not self.generic_yesno_input("Would you like to trigger advanced mode for parameter type fine-tuning", ref):
+            return
+
+        param_type = "const X&"
+        if self.generic_yesno_input("Is it an in-out param", ref):
+            param_type = "X&"
+        elif self.generic_yesno_input("Will the arg be passed onward to other code and not directly used by this function", ref):
+            param_type = "T&& + std::forward"
+        elif self.generic_yesno_input("Is it cheap to copy e.g. int, pointer, smart pointers", ref) or \
+                "unique_ptr" in self.param["type"]:
+            param_type = "X"
+        elif not self.generic_yesno_input("Is it going to be stored or moved", ref):
+            param_type = "const X&"
+        elif self.generic_yesno_input("Will it be unconditionnaly moved", ref):
+            param_type = "X&&"
+        elif self.generic_yesno_input("Will it be copied", ref):
+            if self.generic_yesno_input("Is it expansive to move (e.g. bigPOD, large array)", ref):
+                param_type = "const X&"
+            elif self.generic_yesno_input("Is it copyable, copied on all paths, cheap to move (e.g. std::string, std::vector) and move constructed", ref):
+                param_type = "X"
+            else:
+                param_type = "const X& + X&& overloads or T&& + std::forward"
+
+        self.func_parameters_step_type_react(ref, f"pass arg of type X as {param_type}")
+
+    def func_parameters_step_weaktype(self, ref):
+        if "void" in self.param["type"]:
+            self.func_parameters_step_type_react(ref, "void is a weak type")
+
+    def func_parameters_step_array(self, ref):
+        if any(p in self.param["type"] for p in ["*", "[]"]) and \
+                self.generic_yesno_input("Does the param represent an array", ref):
+            self.func_parameters_step_type_react(
+                ref, "array should be passed as std::array or span")
+
+    def func_parameters_step_smartpointer(self, ref):
+        if any(p in self.param["type"] for p in ["shared_ptr", "unique_ptr"]) and \
+                not self.generic_yesno_input("Will ownership be transferred or shared", ref):
+            self.func_parameters_step_type_react(
+                ref, "T* or T& is better for general use")
+
+    def func_parameters_step_cstring(self, ref):
+        if re.match(".*char\s*\*", self.param["type"]):
+            self.func_parameters_step_type_react(
+                ref, "consider alternative like string_view")
+
+    def func_parameters_step_collision(self, ref):
+        if "params" in self.funcattr and \
+                self.param["type"] == self.funcattr["params"][-1]["type"]:
+            self.func_parameters_step_type_react(
+                ref, "same type as previous param can be confusing")
+
+    def func_parameters_step_boollist(self, ref):
+        if "params" in self.funcattr and \
+            "bool" == self.param["type"] and \
+                any("bool" == p["type"] for p in self.funcattr["params"]):
+            self.param["comments"].append(RecipeCook.format_input(
+                "more than one bool param, consider using flags", ref))
+
+    def func_parameters_step_argscount(self, ref):
+        if "params" in self.funcattr and len(self.funcattr["params"]) >= 4:
+            self.param["comments"].append(RecipeCook.format_input(
+                "more than 4 params, maybe missing an abstration or function has too many responsabilities", ref))
+
+    def func_parameters_finalize(self):
+        self.param["comments"] = ",".join(self.param["comments"])
+        self.funcattr.setdefault("params", []).append(
+            copy.deepcopy(self.param))
+
+    def func_ret_step_type_react(self, ref, msg):
+        self.print_live_annotation("TIPS", ref, msg)
+        if self.generic_yesno_input("Would you like to update return type according to tips", ref):
+            self.ret["rtype"] = self.generic_type_input(
+                "Enter return type", ref)
+        else:
+            self.ret["comments"].append(RecipeCook.format_input(
+                msg, ref))
+
+    def func_ret_initialize(self):
+        self.ret = {}
+        self.ret.setdefault("comments", [])
+
+    def func_ret_step_type(self, ref):
+        self.ret["rtype"] = self.generic_type_input(
+            "Enter return type", ref)
+
+    def func_ret_step_ownership(self, ref):
+        if "*" in self.ret["rtype"] and self.generic_yesno_input("Is it a transfer of ownership", ref):
+            self.func_ret_step_type_react(
+                ref, "beware ownership transferred with raw pointer, consider smart pointer")
+
+    def func_ret_step_byvalue(self, ref):
+        if self.ret["rtype"] == "void":
+            return
+
+        force_not_byvalue = self.generic_yesno_input(
+            "Does it return a container item, enable write access to some representation, or enable chain calls", ref)
+
+        if force_not_byvalue and (self.ret["rtype"] == "auto" or
+                                  not any(ret in self.ret["rtype"] for ret in ["*", "&"])):
+            self.func_ret_step_type_react(
+                ref, "you should not return by value (e.g. auto -> decltype(auto))")
+        elif not force_not_byvalue and any(ret in self.ret["rtype"] for ret in ["*", "&"]):
+            self.func_ret_step_type_react(
+                ref, "prefer return by value if suitable")
+
+    def func_ret_step_nonconst(self, ref):
+        if "const" in self.ret["rtype"]:
+            self.func_ret_step_type_react(
+                ref, "move semantics could be suppressed by 'const'")
+
+    def func_ret_step_rvalueref(self, ref):
+        if "&&" in self.ret["rtype"]:
+            self.func_ret_step_type_react(ref, "never return &&")
+
+    def func_ret_finalize(self):
+        self.ret["comments"] = ",".join(self.ret["comments"])
+        self.funcattr["ret"] = self.ret
+
+    def func_attr_initialize(self):
+        self.funcattr["attr"] = {}
+        self.attr["pre"] = []
+        self.attr["post"] = []
+
+    def func_attr_step_virtual(self, ref):
+        if self.virtual:
+            self.attr["pre"].append("virtual")
+
+    def func_attr_step_constexpr(self, ref):
+        if not self.virtual and \
+                self.generic_yesno_input("Should it be evaluated at compile-time", ref):
+            self.attr["pre"].append("constexpr")
+
+    def func_attr_step_inline(self, ref):
+        if not self.virtual and \
+                not "constexpr" in self.attr["pre"] and \
+                not "tparams" in self.funcattr and \
+                self.generic_yesno_input("Is it small, time-critical and part of a thin abstraction", ref):
+            self.attr["pre"].append("inline")
+
+    def func_attr_step_const(self, ref):
+        if self.funcattr["type"] == "method" and \
+                not self.generic_yesno_input("Will the method modify the object state", ref):
+            self.attr["post"].append("const")
+
+    def func_attr_step_noexcept(self, ref):
+        if not self.generic_yesno_input("Can it throw exceptions", ref):
+            self.attr["post"].append("noexcept")
+
+    def func_attr_step_override(self, ref):
+        if self.virtual and \
+                self.generic_yesno_input("Does the function override a base method behavior", ref):
+            self.attr["post"].append("override")
+            # Override implies virtual
+            self.attr["pre"] = filter(
+                lambda x: x != "virtual", self.attr["pre"])
+
+    def func_attr_finalize(self):
+        self.funcattr["attr"]["pre"] = " ".join(self.attr["pre"])
+        self.funcattr["attr"]["post"] = " ".join(self.attr["post"])
+
+    def func_impl_step_pure(self, ref):
+        if "tparams" not in self.funcattr and \
+            self.funcattr["type"] == "method" and \
+            "virtual" in self.funcattr["attr"]["pre"] \
+                and self.generic_yesno_input("Is it pure", ref):
+            self.funcattr["pure"] = True
+        else:
+            self.funcattr["pure"] = False
+
+
+class LambdaRecipeCook(FunctionRecipeCook):
+    '''Recipe to generate a lambda'''
+
+    def __init__(self, desc, template_path=_recpp_template_path):
+        super().__init__(desc, template_path)
+        self.attr = []
+
+    def dish_templates(self):
+        self.funcattr["annotations"] = self.annotations
+        return [("lambda.h", "lambda.h", self.funcattr)]
+
+    def write_dish(self, output: Output):
+        self.skip_dish(output)
+
+    def lambda_root_step_scope(self, ref):
+        self.local = self.generic_yesno_input(
+            "Would the scope of the lambda be local (not returned, neither stored on the heap or pass to another thread)", ref)
+
+    def lambda_root_step_recursion(self, ref):
+        self.funcattr["recursive"] = self.generic_yesno_input(
+            "Should the lambda be recursive", ref)
+
+    @strong_input(InputType.INT)
+    def capture_list_repeat(self):
+        return self.custom_input("Enter capture list item count")
+
+    def capture_list_step_react(self, ref, msg):
+        self.print_live_annotation("TIPS", ref, msg)
+        if self.generic_yesno_input("Would you like to update captured item according to tips", ref):
+            self.capture = self.generic_misc_input(
+                "Enter captured item full desc e.g. a = std::move(b), &c, d ...", ref)
+
+    def capture_list_step_name(self, ref):
+        self.capture = self.generic_misc_input(
+            "Enter captured item full desc e.g. a = std::move(b), &c, d ...", ref)
+
+    def capture_list_step_ref(self, ref):
+        if self.local and self.capture != "this" and not "&" in self.capture:
+            self.capture_list_step_react(
+                ref, "You might want to capture by reference for local scope lambda")
+
+    def capture_list_step_nonref(self, ref):
+        if not self.local and (self.capture == "this" or "&" in self.capture):
+            self.capture_list_step_react(
+                ref, "You might want to capture by value for non-local scope lambda")
+
+    def capture_list_step_this(self, ref):
+        if not "captures" in self.funcattr:
+            return
+
+        should_fix = False
+        if self.capture == "this" and \
+                any(c in self.funcattr["captures"] for c in ["&", "="]):
+            should_fix = True
+
+        if (self.capture == "&" or self.capture == "=") and \
+                "this" in self.funcattr["captures"]:
+            should_fix = True
+
+        if should_fix:
+            self.capture_list_step_react(
+                ref, "If this is captured, all variables should be captured explicitly")
+
+    def capture_list_finalize(self):
+        self.funcattr.setdefault("captures", []).append(self.capture)
+
+    def lambda_attr_step_constexpr(self, ref):
+        if self.generic_yesno_input("Should it be evaluated at compile-time", ref):
+            self.attr.append("constexpr")
+
+    def lambda_attr_step_mutable(self, ref):
+        if any("=" in capt or "*this" in capt for capt in self.funcattr["captures"]) and \
+                self.generic_yesno_input("Should the capture by value items be mutable", ref):
+            self.attr.append("mutable")
+
+    def lambda_attr_finalize(self):
+        self.funcattr["attr"] = " ".join(self.attr)
+
+
+class DataStructureRecipeCook(RecipeCook):
+    '''Recipe to select a data structure'''
+
+    def __init__(self, desc, template_path=_recpp_template_path):
+        super().__init__(desc, template_path)
+        self.ds = "std::vector"
+        self.comment = ""
+
+    def show_dish_console_impl(self):
+        self.print_live_annotations(self.annotations)
+        print_msg(f"You should probably use a data structure of type {self.ds}", "SUGGEST", file=self.ostream)
+        if self.comment:
+            print_msg(self.comment, "NOTE", file=self.ostream)
+
+    def suggestion(self):
+        return {"ds": self.ds, "comment": self.comment}
+
+    def write_dish(self, output: Output):
+        self.skip_dish(output)
+
+
+class AlgorithmRecipeCook(RecipeCook):
+    '''Recipe to select an algorithm'''
+
+    def __init__(self, desc, template_path=_recpp_template_path):
+        super().__init__(desc, template_path)
+        self.algo = ""
+
+    def show_dish_console_impl(self):
+        self.print_live_annotations(self.annotations)
+        print_msg(f"You should probably use one of the following algorithms -> {self.algo}", "SUGGEST", file=self.ostream)
+
+    def suggestion(self):
+        return {"algo": self.algo}
+
+    def write_dish(self, output: Output):
+        self.skip_dish(output)
+
+
+class ImplRecipeCook(RecipeCook):
+    '''Recipe for implementation code'''
+
+    def __init__(self, desc, template_path=_recpp_template_path):
+        super().__init__(desc, template_path)
+        self.implattr = {}
+
+    def dish_templates(self):
+        self.implattr["annotations"] = self.annotations
+        return [("impl.h", "impl.h", self.implattr)]
+
+    def write_dish(self, output: Output):
+        self.skip_dish(output)
+
+
+_recpp_cookbook = {
+    "design": DesignRecipeCook,
+    "class": ClassRecipeCook,
+    "function": FunctionRecipeCook,
+    "lambda": LambdaRecipeCook,
+    "ds": DataStructureRecipeCook,
+    "algo": AlgorithmRecipeCook,
+    "impl": ImplRecipeCook
+}
+
+# ---------------------------------------------
+# Recipe packs
+# ---------------------------------------------
+
+
+def pack_dirs():
+    '''
+    Get the directories of the recipe packs
+    :return: tuple (pack directories, directories whose content is indexed)
+
+    Packs are directories with a pack.json manifest, either given (or found
+    in a directory given) in RECPP_PACKS (os.pathsep separated) or packages
+    registered in the "recpp.packs" entry point group.
+    '''
+    dirs = []
+    indexed = []
+    for path in filter(None, os.environ.get("RECPP_PACKS", "").split(os.pathsep)):
+        path = Path(path).resolve()
+        if (path / "pack.json").is_file():
+            dirs.append(path)
+        elif path.is_dir():
+            # The subdirs are indexed too: a subdir becomes a pack when its manifest
+            # is added, which changes the mtime of the subdir but not of its parent
+            subdirs = sorted(p for p in path.iterdir() if p.is_dir())
+            indexed.extend([path] + subdirs)
+            dirs.extend(p for p in subdirs if (p / "pack.json").is_file())
+
+    try:
+        from importlib.metadata import entry_points
+        import importlib.util
+    except ImportError:
+        return dirs, indexed
+
+    eps = entry_points()
+    for ep in eps.select(group="recpp.packs") if hasattr(eps, "select") else eps.get("recpp.packs", []):
+        try:
+            spec = importlib.util.find_spec(ep.value.split(":")[0].strip())
+        except (ImportError, ValueError):
+            spec = None
+        if spec and spec.submodule_search_locations:
+            path = Path(list(spec.submodule_search_locations)[0])
+            if (path / "pack.json").is_file():
+                dirs.append(path)
+    return dirs, indexed
+
+
+def recipe_packs():
+    '''
+    Get the dishes of the recipe packs (dish: pack dish desc)
+
+    Only pack manifests are read and the index is kept in the cache dir, it
+    is rebuilt when a manifest, a pack directory or an import path changes.
+    A manifest has the form:
+    {"name": "lowlatency", "dishes": {"lowlat": {"recipe": "lowlat", "cook": "impl", "desc": "..."}}}
+    with the recipe name (<recipe>_recipe.json in the pack directory, default:
+    the dish name) and the cook: a builtin dish whose cook class is reused
+    (default: impl) or "module:Class" for a cook class of a module of the pack.
+    The templates directory of a pack is searched before the builtin templates.
+    '''
+    global _recpp_packs
+    if _recpp_packs is not None:
+        return _recpp_packs
+
+    def mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    roots = [os.environ.get("RECPP_PACKS", "")] + sys.path
+    cdir = cache_dir()
+    cfile = cdir / f"packs_{zlib.crc32(os.pathsep.join(roots).encode()):08x}.pickle" if cdir else None
+    if cfile and cfile.exists():
+        try:
+            with open(cfile, "rb") as f:
+                index = pickle.load(f)
+            if all(mtime(path) == m for path, m in index["stats"].items()):
+                _recpp_packs = index["dishes"]
+                return _recpp_packs
+        except Exception:
+            pass
+
+    dirs, indexed = pack_dirs()
+    stats = {path: mtime(path) for path in sys.path + [str(d) for d in indexed] if path}
+    dishes = {}
+    for path in dirs:
+        manifest = path / "pack.json"
+        stats[str(manifest)] = mtime(manifest)
+        try:
+            with open(str(manifest), "r", encoding="utf8") as f:
+                desc = json.load(f)
+            pack_dishes = desc.get("dishes", {})
+        except (OSError, ValueError, AttributeError) as e:
+            print_msg(f"invalid recipe pack manifest {manifest}: {e}", "WARN", file=sys.stderr)
+            continue
+        for dish, dish_desc in pack_dishes.items():
+            if dish in _recpp_cookbook or dish in dishes or dish == "all":
+                print_msg(f"dish '{dish}' of recipe pack {path} is already defined", "WARN", file=sys.stderr)
+                continue
+            dishes[dish] = dict(dish_desc, pack=desc.get("name", path.name), path=str(path))
+
+    if cfile:
+        write_cache(cfile, {"stats": stats, "dishes": dishes})
+
+    _recpp_packs = dishes
+    return dishes
+
+
+def known_dish(dish: str):
+    '''Check if a dish is a builtin or a recipe pack dish'''
+    return dish in _recpp_cookbook or dish in recipe_packs()
+
+
+def all_dishes():
+    '''Get the names of all dishes, builtin first then recipe pack dishes'''
+    return list(_recpp_cookbook) + sorted(recipe_packs())
+
+
+def dish_class(dish: str):
+    '''Get the cook class of a dish, the cook module of a recipe pack is loaded on first use'''
+    if dish in _recpp_cookbook:
+        return _recpp_cookbook[dish]
+    pack = recipe_packs().get(dish)
+    if pack is None:
+        raise RecppError(f"unknown dish '{dish}'")
+
+    cook = pack.get("cook", "impl")
+    if ":" not in cook:
+        if cook not in _recpp_cookbook:
+            raise RecppError(f"unknown cook '{cook}' for dish '{dish}'")
+        return _recpp_cookbook[cook]
+
+    module, _, name = cook.partition(":")
+    key = f"recpp_pack_{pack['pack']}_{module}"
+    mod = sys.modules.get(key)
+    if mod is None:
+        import importlib.util
+        # Cook modules subclass the cooks of this module, whatever name it was run under
+        sys.modules.setdefault("recpp", sys.modules[__name__])
+        path = Path(pack["path"]) / (module.replace(".", os.sep) + ".py")
+        spec = importlib.util.spec_from_file_location(key, str(path))
+        if spec is None:
+            raise RecppError(f"no cook module '{module}' in recipe pack {pack['path']}")
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules[key] = mod
+        try:
+            spec.loader.exec_module(mod)
+        except Exception:
+            del sys.modules[key]
+            raise
+    if not hasattr(mod, name):
+        raise RecppError(f"no cook class '{name}' in {module} of recipe pack {pack['path']}")
+    return getattr(mod, name)
+
+
+def dish_cook(dish: str, template_path=None):
+    '''
+    Create the cook of a dish with its recipe
+    :param dish: builtin or recipe pack dish name
+    :param template_path: template directory (default: builtin templates, preceded by
+                          the templates directory of the recipe pack of the dish)
+    '''
+    cls = dish_class(dish)
+    if template_path is None:
+        template_path = _recpp_template_path
+        pack = recipe_packs().get(dish) if dish not in _recpp_cookbook else None
+        if pack and os.path.isdir(os.path.join(pack["path"], "templates")):
+            template_path = [os.path.join(pack["path"], "templates"), _recpp_template_path]
+    return cls(load_recipe(dish), template_path)
+
+# ---------------------------------------------
+# Cookbook actions
+# ---------------------------------------------
+
+
+def compile_cookbook(sources: Dict, recipe_path: str):
+    '''
+    Parse all recipe database files
+    :param sources: recipe file stats (name: (mtime, size))
+    :param recipe_path: recipe directory
+    '''
+    recipes = {}
+    for name in sources:
+        with open(str(Path(recipe_path) / name), "r", encoding="utf8") as f:
+            rec = json.load(f)
+        for meta in rec:
+            # Annotations are stored as tuples so that the pickle file does not refer to
+            # this module, whatever name it runs under (script or imported module)
+            meta["annotations"] = [(a["type"], a["ref"], a["msg"], a.get("check", "")) for a in meta["annotations"]]
+        recipes[name[:-len("_recipe.json")]] = rec
+    return {"version": _recpp_cookbook_version, "sources": sources, "recipes": recipes}
+
+
+def frozen(value):
+    '''Get a read-only copy of a json value (dicts become read-only mappings and lists tuples)'''
+    if isinstance(value, dict):
+        return MappingProxyType({k: frozen(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(frozen(v) for v in value)
+    return value
+
+
+def unpack_recipes(recipes: Dict):
+    '''
+    Get compiled recipes with their annotations as Annotation records
+
+    Recipes are shared by all the cooks of the process (and are the keys of the
+    dispatch plan and decision caches), they are read-only so that a cook or a
+    library caller cannot alter the recipe of the next cooks
+    '''
+    return {dish: frozen([dict(meta, annotations=[Annotation(*a) for a in meta["annotations"]]) for meta in rec])
+            for dish, rec in recipes.items()}
+
+
+def load_cookbook(recipe_path=_recpp_recipe_path):
+    '''
+    Load all recipes at once from the compiled cookbook
+
+    The compiled cookbook is a pickle file in the cache dir that is
+    rebuilt only when a recipe database file is added, removed or modified.
+    A zipapp build loads the recipes it was built with.
+    '''
+    key = str(Path(recipe_path).resolve())
+    if recipe_path == _recpp_recipe_path and not os.path.isdir(recipe_path):
+        cookbook = _recpp_cookbooks.get(key)
+        if cookbook is None:
+            bundle = load_bundle()
+            if bundle is None:
+                raise RecppError(f"no recipe directory {recipe_path}")
+            cookbook = {"version": _recpp_cookbook_version, "sources": None, "recipes": unpack_recipes(bundle.recipes)}
+            _recpp_cookbooks[key] = cookbook
+        return cookbook["recipes"]
+
+    sources = {}
+    for entry in sorted(os.scandir(recipe_path), key=lambda e: e.name):
+        if entry.name.endswith("_recipe.json"):
+            st = entry.stat()
+            sources[entry.name] = (st.st_mtime_ns, st.st_size)
+
+    cookbook = _recpp_cookbooks.get(key)
+    if cookbook and cookbook["sources"] == sources:
+        return cookbook["recipes"]
+
+    cdir = cache_dir()
+    cfile = cdir / f"cookbook_{zlib.crc32(key.encode()):08x}.pickle" if cdir else None
+    cookbook = None
+    if cfile and cfile.exists():
+        try:
+            with open(cfile, "rb") as f:
+                cookbook = pickle.load(f)
+        except Exception:
+            cookbook = None
+
+    if not cookbook or cookbook.get("version") != _recpp_cookbook_version or cookbook["sources"] != sources:
+        cookbook = compile_cookbook(sources, recipe_path)
+        if cfile:
+            write_cache(cfile, cookbook)
+
+    cookbook = dict(cookbook, recipes=unpack_recipes(cookbook["recipes"]))
+    _recpp_cookbooks[key] = cookbook
+    return cookbook["recipes"]
+
+
+def load_recipe(recipe_type: str):
+    '''
+    Load recipe from the compiled cookbook, or from the compiled cookbook of its recipe pack
+    :return: read-only recipe shared by the process (see unpack_recipes)
+    '''
+    recipes = load_cookbook()
+    if recipe_type in recipes:
+        return recipes[recipe_type]
+
+    pack = recipe_packs().get(recipe_type) if recipe_type not in _recpp_cookbook else None
+    if pack:
+        recipes = load_cookbook(pack["path"])
+        if pack.get("recipe", recipe_type) in recipes:
+            return recipes[pack.get("recipe", recipe_type)]
+    raise RecppError(f"no recipe for dish '{recipe_type}'")
+
+
+def cook(dish: str, display_live_annot: bool, odir: str, profiler=None, input_provider=None, merge=None,
+         bench=False):
+    '''
+    Dispatch cooking step to the correct handler
+    :param dish: dish name
+    :param display_live_annot: set to True to display tips while cooking
+    :param odir: output directory for generated code
+    :param profiler: optional Profiler recording the stages of the run
+    :param input_provider: optional InputProvider (default: interactive)
+    :param merge: optional region id to merge generated code into the files of odir (see MergeOutput)
+    :param bench: set to True to generate the benchmark of the dishes that have one (free functions)
+    '''
+    profiler = profiler or NullProfiler()
+    if merge is not None:
+        if not odir:
+            raise RecppError("merging generated code requires an output directory")
+        odir = output_target(odir, merge)
+    with profiler.stage("dish", dish):
+        with profiler.stage("load", "load_recipe"):
+            cook = dish_cook(dish)
+        cook.profiler = profiler
+        cook.bench = bench
+        if input_provider:
+            cook.input_provider = input_provider
+        cook.cook(do_live_annot=display_live_annot)
+        cook.serve_dish(odir)
+
+
+def decide(dish: str, features: List[Dict]):
+    '''
+    Evaluate the decision trees of a recipe on feature vectors without prompting
+    :param dish: dish name (design, ds, algo)
+    :param features: list of feature vectors (feature: value) e.g. {"concern": "unit", "undo": True}
+    :return: list of decisions (attribute: value), one per feature vector
+             e.g. {"concern": "unit", "pattern": "Command, Memento"}
+
+    Decisions are memoized on the values of the features used by the recipe
+    so that an inventory with recurring vectors is evaluated once per distinct vector.
+    '''
+    desc = load_recipe(dish)
+    plan = dish_class(dish).dispatch_plan(desc)
+
+    trees = {}
+    for metastep in plan:
+        for _, tree, _, _ in metastep["steps"]:
+            if isinstance(tree, DecisionTree):
+                trees.update({name: tree for name in tree.features if name not in trees})
+    if not trees:
+        raise RecppError(f"no decision tree in recipe '{dish}'")
+
+    key = (dish, id(desc))
+    cached = _recpp_decisions.get(key)
+    if not cached or cached[0] is not desc:
+        cached = (desc, {})
+        _recpp_decisions[key] = cached
+    memo = cached[1]
+
+    decisions = []
+    for i, vector in enumerate(features):
+        try:
+            vkey = tuple(None if vector.get(name) is None and tree.features[name] == "choice"
+                         else tree.feature_value(name, vector.get(name)) for name, tree in trees.items())
+            decision = memo.get(vkey)
+            if decision is None:
+                decision = decide_vector(plan, vector)
+                memo[vkey] = decision
+        except RecppError as e:
+            raise RecppError(f"feature vector {i}: {e}")
+        decisions.append(dict(decision))
+    return decisions
+
+
+def decide_vector(plan: List, vector: Dict):
+    '''Walk the decision trees of a dispatch plan for a feature vector'''
+    from types import SimpleNamespace
+
+    state = SimpleNamespace()
+    for metastep in plan:
+        if not metastep["reachable"] or (metastep["when"] and not metastep["when"](state)):
+            continue
+        for _, tree, _, guard in metastep["steps"]:
+            if isinstance(tree, DecisionTree) and (guard is None or guard(state)):
+                vars(state).update(tree.evaluate(vector))
+    return vars(state)
+
+
+def recipe_annotations(dish: str, whitelist="*", search=""):
+    '''
+    Get the annotations of a recipe
+    :param dish: dish name or "all"
+    :param whitelist: annotation query used to filter annotations (see AnnotationIndex.query)
+    :param search: free text used to rank annotations by relevance
+    :return: list of Annotation
+    '''
+    index = annotation_index(all_dishes() if dish == "all" else [dish])
+    # General annotations (type *) are always kept
+    keep = AnnotationType.ALL.value if whitelist.strip() != "*" else 0
+    if not search:
+        return index.query(whitelist, keep)
+    return index.search(search, index.match(whitelist) | index.with_types(keep))
+
+
+def recipe_steps(dish: str):
+    '''
+    Get the steps of a recipe
+    :param dish: dish name or "all"
+    :return: list of metasteps ({"cookstep", "description", "substeps"}), with the
+             dish name ("dish") of each metastep for "all"
+    '''
+    if dish == "all":
+        return [dict({"dish": name}, **step) for name in all_dishes() for step in recipe_steps(name)]
+    return [{"cookstep": meta["id"],
+             "description": meta["desc"],
+             "substeps": [f"{s['id']}: {s['desc']}" for s in meta["steps"]]} for meta in load_recipe(dish)]
+
+
+def recipe(dish: str, with_annot: bool, whitelist: str, with_header=True, search="", fmt="text"):
+    '''
+    List steps in a recipe
+    :param dish: dish name
+    :param with_annot: display annotations instead of steps
+    :param whitelist: annotation query used to filter annotations (see AnnotationIndex.query)
+    :param search: free text used to rank annotations by relevance
+    :param fmt: "text" or "ndjson" (see recipe_records)
+    '''
+    if fmt == "ndjson":
+        try:
+            for record in recipe_records(dish, with_annot, whitelist, search):
+                sys.stdout.write(json.dumps(record) + "\n")
+            sys.stdout.flush()
+        except BrokenPipeError:
+            # The consumer stopped reading (e.g. head), do not fail on the final flush
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return
+
+    if with_annot:
+        steps = [f"{a.type} [{a.ref}]: {a.msg}" for a in recipe_annotations(dish, whitelist, search)]
+    else:
+        steps = recipe_steps(dish)
+
+    if with_header:
+        print(_recpp_recipe)
+
+    if with_annot and steps:
+        print('\n'.join(steps))
+    elif steps:
+        print(json.dumps(steps, indent=2, sort_keys=False))
+
+
+def recipe_records(dish: str, with_annot: bool, whitelist="*", search=""):
+    '''
+    Generate the annotations or steps of a recipe as json records, one at a time
+    :param dish: dish name or "all"
+    :return: generator of annotations ({"type", "ref", "msg"}) or steps
+             ({"dish", "cookstep", "step", "desc", "ref"})
+    '''
+    if with_annot:
+        for annot in recipe_annotations(dish, whitelist, search):
+            yield annot.to_dict()
+        return
+
+    for name in all_dishes() if dish == "all" else [dish]:
+        for meta in load_recipe(name):
+            for step in meta["steps"]:
+                yield {"dish": name, "cookstep": meta["id"], "step": step["id"], "desc": step["desc"], "ref": step["ref"]}
+
+
+def load_batch_spec(spec: str, overrides=None):
+    '''
+    Load a batch spec file (json or yaml)
+    :param spec: batch spec file
+    :param overrides: optional dict of keys (e.g. command line "odir") taking precedence
+                      over the spec defaults but not over the keys of a dish spec
+
+    A spec is either a list of dish specs or a dict with a "dishes" list and
+    optional defaults ("odir", "annot") applied to each dish spec.
+    A dish spec has the form:
+    {"dish": "class", "answers": [...] or {...}, "odir": "/tmp/recpp", "annot": false}
+    '''
+    with open(spec, "r", encoding="utf8") as f:
+        if Path(spec).suffix in [".yaml", ".yml"]:
+            try:
+                import yaml
+            except ImportError:
+                raise RecppError("pyyaml is required for yaml batch spec")
+            desc = yaml.safe_load(f)
+        else:
+            desc = json.load(f)
+
+    defaults = {}
+    if isinstance(desc, dict):
+        defaults = {k: v for k, v in desc.items() if k != "dishes"}
+        desc = desc.get("dishes", [])
+
+    if not isinstance(desc, list):
+        raise RecppError("batch spec must be a list of dishes")
+
+    defaults.update(overrides or {})
+    return [dict(defaults, **item) for item in desc]
+
+
+def cook_batch_item(item: Dict, profile=False):
+    '''
+    Cook a single dish spec without any user interaction
+    :param item: dish spec
+    :param profile: set to True to record the stages of the cook
+    :return: dict with the error message or None ("error"), the console output ("output"),
+             the file counts [written, unchanged, skipped] ("counts"), the profile trace
+             events ("events"), the generated files if the output is an archive ("files")
+             and the names of the dish templates ("templates")
+
+    Dishes written to an archive are kept in memory, the archive being
+    written in a single pass by the batch process.
+    '''
+    out = io.StringIO()
+    result = {"error": None, "output": "", "counts": [0, 0, 0], "events": [], "files": None, "templates": None}
+    profiler = Profiler() if profile else NullProfiler()
+    try:
+        dish = item.get("dish", "")
+        if not known_dish(dish):
+            raise RecppError(f"unknown dish '{dish}'")
+
+        odir = item.get("odir", "")
+        merge = {True: "", False: None}.get(item.get("merge"), item.get("merge"))
+        if merge is not None:
+            if not odir:
+                raise RecppError("merging generated code requires an output directory")
+            odir = output_target(odir, str(merge))
+        elif ArchiveOutput.archive_suffix(odir):
+            odir = MemoryOutput()
+            result["files"] = odir.files
+
+        with profiler.stage("dish", dish):
+            with profiler.stage("load", "load_recipe"):
+                cook = dish_cook(dish)
+            cook.ostream = out
+            cook.input_provider = ScriptedAnswers(item.get("answers", []))
+            cook.profiler = profiler
+            cook.bench = bool(item.get("bench", False))
+            cook.cook(do_live_annot=item.get("annot", False))
+            output = cook.serve_dish(odir)
+        if output:
+            result["counts"] = [len(output.written), len(output.unchanged), len(output.skipped)]
+        result["templates"] = [tpl for _, tpl, _ in cook.dish_templates()]
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+    finally:
+        if profile:
+            profiler.close()
+
+    result["output"] = out.getvalue()
+    result["events"] = getattr(profiler, "events", [])
+    return result
+
+
+def cook_batch(spec: str, odir: str, jobs: int, profiler=None, merge=None, bench=False):
+    '''
+    Cook all dishes of a batch spec file on a pool of worker processes
+    :param spec: batch spec file
+    :param odir: default output directory for generated code
+    :param jobs: number of worker processes (0 for cpu count)
+    :param profiler: optional Profiler collecting the stages recorded by the workers
+    :param merge: optional default region id to merge generated code into the files of odir
+    :param bench: set to True to generate the benchmarks of the dishes by default
+    :return: number of failed dishes
+    '''
+    items = batch_items(spec, odir, merge, bench)
+    if not items:
+        return 0
+
+    results = cook_batch_items(items, jobs, profile=profiler is not None)
+    return serve_batch(items, results, range(len(items)), profiler)
+
+
+def batch_items(spec: str, odir: str, merge=None, bench=False):
+    '''
+    Load the dish specs of a batch spec file with a default output directory, merge region id
+    and benchmark generation
+
+    Dishes writing whole files to the same output dir would overwrite the files of
+    each other (e.g. two function.h), each of them is written to a <index>-<dish>
+    subdir of the output dir as in archives. Dishes merging regions share the dir.
+    The command line values take precedence over the spec defaults, the keys of a
+    dish spec over both.
+    '''
+    overrides = {"odir": odir} if odir else {}
+    if merge is not None:
+        overrides["merge"] = merge
+    if bench:
+        overrides["bench"] = True
+    items = load_batch_spec(spec, overrides)
+
+    def shared_dir(item: Dict):
+        if not item.get("odir") or ArchiveOutput.archive_suffix(item["odir"]) or \
+                item.get("merge") not in [None, False]:
+            return None
+        return os.path.normpath(item["odir"])
+
+    dirs = [shared_dir(item) for item in items]
+    return [dict(item, odir=str(Path(item["odir"]) / f"{i}-{item.get('dish', '')}"))
+            if d and dirs.count(d) > 1 else item for i, (item, d) in enumerate(zip(items, dirs))]
+
+
+def cook_batch_items(items: List[Dict], jobs: int, profile=False):
+    '''
+    Cook dish specs on a pool of worker processes
+    :param items: dish specs
+    :param jobs: number of worker processes (0 for cpu count)
+    :param profile: set to True to record the stages of the cooks
+    :return: list of results (see cook_batch_item)
+    '''
+    cook_item = partial(cook_batch_item, profile=profile)
+    workers = jobs or os.cpu_count() or 1
+    if len(items) <= 1 or workers == 1:
+        return [cook_item(item) for item in items]
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(cook_item, items, chunksize=max(1, len(items) // (4 * workers))))
+
+
+def serve_batch(items: List[Dict], results: List[Dict], served, profiler=None):
+    '''
+    Report cooked dish specs and write the archives
+    :param items: dish specs
+    :param results: last result of each dish spec (see cook_batch_item)
+    :param served: indexes of the dish specs cooked since the last report
+    :param profiler: optional Profiler collecting the stages recorded by the workers
+    :return: number of failed dishes
+    '''
+    failures = 0
+    totals = [0, 0, 0]
+    for i in served:
+        item, res = items[i], results[i]
+        totals = [t + c for t, c in zip(totals, res["counts"])]
+        if profiler is not None:
+            profiler.events.extend(res["events"])
+        print(f"\n~~~ Batch dish {i} - {item.get('dish', '')} ~~~\n")
+        if res["output"]:
+            print(res["output"], end="")
+        if res["error"]:
+            failures += 1
+            print_msg(f"dish {i} ({item.get('dish', '')}) failed: {res['error']}")
+
+    # Archives are rewritten as a whole, the files of each dish are stored in a <index>-<dish> dir
+    archives = {}
+    for i, (item, res) in enumerate(zip(items, results)):
+        if not res["error"] and res["files"]:
+            archive = archives.setdefault(item["odir"], ArchiveOutput(item["odir"]))
+            for name, code in res["files"].items():
+                archive.write(f"{i}-{item['dish']}/{name}", [code])
+
+    for path, archive in archives.items():
+        archive.close()
+        print_msg(f"{len(archive.written)} files archived in {path}", "INFO")
+
+    print_msg(f"{len(served) - failures}/{len(served)} dishes cooked", "INFO")
+    if any(totals):
+        print_msg(f"{totals[0]} files written, {totals[1]} unchanged, {totals[2]} skipped", "INFO")
+    return failures
+
+# ---------------------------------------------
+# Watch mode
+# ---------------------------------------------
+
+
+class FileWatcher(object):
+    '''
+    Watch files and flat directories for changes
+
+    Changes are read from inotify (linux, through libc) and detected by
+    polling file stats every poll seconds when inotify is not available.
+    A watched file is watched through its directory so that editors that
+    save by renaming a new file over the old one are handled.
+    '''
+
+    # inotify_init1 and inotify_event constants (see inotify(7))
+    IN_CLOEXEC = 0o2000000
+    IN_EVENTS = 0x8 | 0x40 | 0x80 | 0x100 | 0x200  # CLOSE_WRITE, MOVED_FROM, MOVED_TO, CREATE, DELETE
+    IN_Q_OVERFLOW = 0x4000
+
+    def __init__(self, paths: List[str], poll=0.5, use_inotify=True):
+        self.dirs = {}
+        for path in paths:
+            path = Path(path).resolve()
+            if path.is_dir():
+                self.dirs[str(path)] = None
+            else:
+                names = self.dirs.setdefault(str(path.parent), set())
+                if names is not None:
+                    names.add(path.name)
+        self.poll = poll
+        self.fd = self.inotify() if use_inotify else -1
+        self.stats = None if self.fd >= 0 else self.snapshot()
+
+    def inotify(self):
+        '''Watch the directories with inotify, return the inotify fd or -1'''
+        if not sys.platform.startswith("linux"):
+            return -1
+        try:
+            import ctypes
+            import ctypes.util
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(self.IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return -1
+        if fd < 0:
+            return -1
+
+        self.wds = {}
+        for path in self.dirs:
+            wd = libc.inotify_add_watch(fd, os.fsencode(path), self.IN_EVENTS)
+            if wd < 0:
+                os.close(fd)
+                return -1
+            self.wds[wd] = path
+        return fd
+
+    def watched(self, dir: str, name: str):
+        names = self.dirs[dir]
+        return names is None or name in names
+
+    def snapshot(self):
+        '''Get the stats of the watched files (path: (mtime, size))'''
+        stats = {}
+        for path in self.dirs:
+            try:
+                entries = list(os.scandir(path))
+            except OSError:
+                continue
+            for entry in entries:
+                if entry.is_file() and self.watched(path, entry.name):
+                    st = entry.stat()
+                    stats[entry.path] = (st.st_mtime_ns, st.st_size)
+        return stats
+
+    def changes(self, timeout: float):
+        '''Get the paths changed within timeout seconds (None for no timeout)'''
+        if self.fd < 0:
+            end = None if timeout is None else time.monotonic() + timeout
+            while True:
+                stats = self.snapshot()
+                changed = {p for p in stats.keys() | self.stats.keys() if stats.get(p) != self.stats.get(p)}
+                self.stats = stats
+                if changed or (end is not None and time.monotonic() >= end):
+                    return changed
+                time.sleep(self.poll if end is None else max(0, min(self.poll, end - time.monotonic())))
+
+        import select
+        import struct
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return set()
+
+        buf = os.read(self.fd, 65536)
+        changed = set()
+        pos = 0
+        while pos < len(buf):
+            wd, mask, _, size = struct.unpack_from("iIII", buf, pos)
+            name = os.fsdecode(buf[pos + 16:pos + 16 + size].rstrip(b"\0"))
+            pos += 16 + size
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were lost, every watched file may have changed
+                changed.update(os.path.join(d, n) for d, names in self.dirs.items()
+                               for n in (names or os.listdir(d)))
+            elif wd in self.wds and self.watched(self.wds[wd], name):
+                changed.add(os.path.join(self.wds[wd], name))
+        return changed
+
+    def wait(self, debounce: float):
+        '''
+        Wait for changes
+        :param debounce: the changes are collected until none happened for debounce seconds
+        :return: set of changed paths
+        '''
+        changed = self.changes(None)
+        while True:
+            burst = self.changes(debounce)
+            if not burst:
+                return changed
+            changed |= burst
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def template_chain(name: str, template_path=_recpp_template_path):
+    '''
+    Get a template and all the templates it extends, includes or imports
+    :return: set of template names
+    '''
+    return {tpl for tpl in template_sources(template_env(template_path), name) if tpl}
+
+
+def watch(spec: str, odir: str, jobs: int, debounce=0.2,
+          recipe_path=_recpp_recipe_path, template_path=_recpp_template_path, merge=None, bench=False):
+    '''
+    Cook all dishes of a batch spec then cook them again on changes, until interrupted
+    :param spec: batch spec file (saved answers)
+    :param odir: default output directory for generated code
+    :param jobs: number of worker processes (0 for cpu count)
+    :param debounce: changes are collected until none happened for debounce seconds
+    :param merge: optional default region id to merge generated code into the files of odir
+    :param bench: set to True to generate the benchmarks of the dishes by default
+
+    Only the dishes affected by a change are cooked again: the dishes whose
+    recipe changed, the dishes with a template of their inheritance chain
+    (e.g. class.h for concrete_class.h) that changed and the dish specs that
+    changed in the batch spec. Failed dishes are cooked again on any change.
+    '''
+    resident_render_cache()
+    recipe_dir = str(Path(recipe_path).resolve())
+    template_dir = str(Path(template_path).resolve())
+    spec_file = str(Path(spec).resolve())
+    watcher = FileWatcher([recipe_path, template_path, spec])
+
+    def dependencies(res: Dict):
+        if res["templates"] is None:
+            return None
+        return set().union(*(template_chain(tpl, template_path) for tpl in res["templates"]))
+
+    try:
+        items = batch_items(spec, odir, merge, bench)
+        results = cook_batch_items(items, jobs)
+        deps = [dependencies(res) for res in results]
+        serve_batch(items, results, range(len(items)))
+        print_msg(f"watching {recipe_path}, {template_path} and {spec} (ctrl-c to stop)", "INFO")
+
+        while True:
+            changed = watcher.wait(debounce)
+            recipes = {Path(p).name[:-len("_recipe.json")] for p in changed
+                       if str(Path(p).parent) == recipe_dir and p.endswith("_recipe.json")}
+            templates = {os.path.relpath(p, template_dir).replace(os.sep, "/") for p in changed
+                         if str(Path(p).parent) == template_dir}
+
+            served = set()
+            if spec_file in changed:
+                try:
+                    new_items = batch_items(spec, odir, merge, bench)
+                except (RecppError, OSError, ValueError) as e:
+                    print_msg(f"invalid batch spec {spec}: {e}")
+                    continue
+                served = {i for i, item in enumerate(new_items) if i >= len(items) or item != items[i]}
+                results = results[:len(new_items)] + [None] * (len(new_items) - len(results))
+                deps = deps[:len(new_items)] + [None] * (len(new_items) - len(deps))
+                items = new_items
+
+            for i, item in enumerate(items):
+                if deps[i] is None and (recipes or templates):
+                    served.add(i)
+                elif item.get("dish") in recipes or (deps[i] and deps[i] & templates):
+                    served.add(i)
+
+            if not served:
+                continue
+
+            names = sorted(os.path.relpath(p) for p in changed)
+            print_msg(f"{', '.join(names)} changed, cooking dishes {', '.join(map(str, sorted(served)))}", "INFO")
+            served = sorted(served)
+            for i, res in zip(served, cook_batch_items([items[i] for i in served], jobs)):
+                results[i] = res
+                deps[i] = dependencies(res)
+            serve_batch(items, results, served)
+    except KeyboardInterrupt:
+        print_msg("watch stopped", "INFO")
+    finally:
+        watcher.close()
+
+# ---------------------------------------------
+# Lint mode
+# ---------------------------------------------
+
+
+def lint_rules(whitelist="*"):
+    '''
+    Get the annotations with a check of all recipes
+    :param whitelist: annotation query used to select the rules (see AnnotationIndex.query)
+    '''
+    index = annotation_index(all_dishes())
+    return [a for a in index.query(whitelist) if a.check]
+
+
+def lint_file(task, rules):
+    '''
+    Check a C++ file against lint rules (worker side)
+    :param task: tuple (path, digest of the file when it was last linted or None)
+    :param rules: tuple of rule regexes
+    :return: tuple (path, content digest, findings [(line, column, rule index)] or None
+             if the content did not change since it was last linted)
+    '''
+    import bisect
+    import hashlib
+    import mmap
+
+    compiled = _recpp_lint_rules.get(rules)
+    if compiled is None:
+        compiled = _recpp_lint_rules[rules] = [re.compile(r.encode("utf8")) for r in rules]
+
+    path, last_digest = task
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return path, "", []
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            digest = hashlib.blake2b(mm, digest_size=16).hexdigest()
+            if digest == last_digest:
+                return path, digest, None
+
+            findings = []
+            skipped = None
+            lines = None
+            for i, rule in enumerate(compiled):
+                for m in rule.finditer(mm):
+                    if skipped is None:
+                        # Comments and strings are only located once a rule matches
+                        skipped = [(s.start(), s.end()) for s in _recpp_lint_skip_regex.finditer(mm)]
+                        starts = [s[0] for s in skipped]
+                    k = bisect.bisect_right(starts, m.start()) - 1
+                    if k >= 0 and m.start() < skipped[k][1]:
+                        continue
+                    if lines is None:
+                        lines = [n.start() for n in re.finditer(b"\n", mm)]
+                    line = bisect.bisect_left(lines, m.start())
+                    col = m.start() - (lines[line - 1] + 1 if line else 0)
+                    findings.append((line + 1, col + 1, i))
+    return path, digest, findings
+
+
+def lint(root: str, whitelist="*", jobs=0):
+    '''
+    Check a C++ source tree against the annotations with a check
+    :param root: source tree root directory
+    :param whitelist: annotation query used to select the rules (see AnnotationIndex.query)
+    :param jobs: number of worker processes (0 for cpu count)
+    :return: number of findings
+
+    Findings are cached per file by content digest in the cache dir (one cache
+    per root and rule set, so that switching -k back and forth keeps them), a
+    file whose size and mtime did not change is not read again and a changed
+    file whose content did not change is not checked again.
+    '''
+    if not os.path.isdir(root):
+        raise RecppError(f"no source directory {root}")
+
+    annots = lint_rules(whitelist)
+    rules = tuple(a.check for a in annots)
+    # Findings depend on the rules and on the comments and literals they skip
+    signature = zlib.crc32("\n".join(rules).encode() + b"\0" + _recpp_lint_skip_regex.pattern)
+
+    files = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        files.extend(os.path.join(dirpath, name) for name in sorted(filenames)
+                     if os.path.splitext(name)[1].lower() in _recpp_lint_extensions)
+
+    cdir = cache_dir()
+    cfile = cdir / f"lint_{zlib.crc32(str(Path(root).resolve()).encode()):08x}_{signature:08x}.pickle" if cdir else None
+    cache = None
+    if cfile and cfile.exists():
+        try:
+            with open(cfile, "rb") as f:
+                cache = pickle.load(f)
+        except Exception:
+            cache = None
+    if not cache or cache.get("rules") != signature:
+        cache = {"rules": signature, "files": {}, "results": {}}
+
+    tasks = []
+    stats = {}
+    digests = {}
+    for path in files:
+        st = os.stat(path)
+        stats[path] = (st.st_mtime_ns, st.st_size)
+        mtime, size, digest = cache["files"].get(path, (None, None, None))
+        if (mtime, size) == stats[path] and digest in cache["results"]:
+            digests[path] = digest
+        else:
+            tasks.append((path, digest if digest in cache["results"] else None))
+
+    check = partial(lint_file, rules=rules)
+    workers = jobs or os.cpu_count() or 1
+    if len(tasks) <= 1 or workers == 1:
+        results = [check(task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(check, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+    for path, digest, findings in results:
+        digests[path] = digest
+        if findings is not None:
+            cache["results"][digest] = findings
+
+    count = 0
+    flagged = 0
+    for path in files:
+        findings = cache["results"][digests[path]]
+        flagged += bool(findings)
+        for line, col, i in sorted(findings):
+            count += 1
+            print(f"{path}:{line}:{col}: {annots[i].type} [{annots[i].ref}]: {annots[i].msg}")
+
+    if cfile:
+        cache["files"] = {path: stats[path] + (digests[path],) for path in files}
+        used = set(digests.values())
+        cache["results"] = {d: r for d, r in cache["results"].items() if d in used}
+        write_cache(cfile, cache)
+
+    print_msg(f"{count} findings in {flagged}/{len(files)} files "
+              f"({len(tasks)} checked, {len(files) - len(tasks)} cached, {len(rules)} rules)", "INFO")
+    return count
+
+# ---------------------------------------------
+# Library API
+# ---------------------------------------------
+
+
+class Dish(object):
+    '''Cooked dish returned by cook_dish'''
+
+    def __init__(self, dish: str, files: Dict, annotations: List, suggestion: Dict, text: str):
+        '''
+        Constructor
+        :param dish: dish name
+        :param files: rendered files (name: code)
+        :param annotations: recipe annotations collected while cooking (Annotation)
+        :param suggestion: decided attributes of decision making dishes (e.g. {"pattern": "Bridge"})
+        :param text: dish as served on console, without banner
+        '''
+        self.dish = dish
+        self.files = files
+        self.annotations = annotations
+        self.suggestion = suggestion
+        self.text = text
+
+    def encoded(self, encoding="utf8"):
+        '''Get the rendered files as bytes (name: bytes)'''
+        return {name: code.encode(encoding) for name, code in self.files.items()}
+
+    def write(self, output: Output):
+        '''Write the rendered files to an output target'''
+        for name, code in self.files.items():
+            output.write(name, [code])
+
+
+def cook_dish(dish: str, answers, template_path=None):
+    '''
+    Cook a dish in-process without any prompt or printing
+    :param dish: dish name
+    :param answers: answers as in batch specs (list in prompt order or dict keyed by
+                    step callback name) or an InputProvider
+    :param template_path: template directory (default: the dish templates)
+    :return: Dish
+    :raise RecppError: unknown dish, missing or invalid answer
+    '''
+    cook = dish_cook(dish, template_path)
+    cook.ostream = io.StringIO()
+    cook.input_provider = answers if isinstance(answers, InputProvider) else ScriptedAnswers(answers)
+    cook.cook(do_live_annot=False)
+    return Dish(dish, cook.render_dish(), list(cook.annotations),
+                cook.suggestion(), cook.dish_text())
+
+# ---------------------------------------------
+# Server mode
+# ---------------------------------------------
+
+
+class PendingInput(Exception):
+    '''Raised in a session when a recipe needs an answer that was not given yet'''
+
+    def __init__(self, step: str, query: str, ref: str):
+        super().__init__(query)
+        self.step = step
+        self.query = query
+        self.ref = ref
+
+
+class SessionAnswers(ScriptedAnswers):
+    '''Answers of a step-driven session replayed from the start of the recipe'''
+
+    def __init__(self, answers: List[str], ostream):
+        super().__init__(answers)
+        self.count = len(answers)
+        self.consumed = 0
+        self.rejected = []
+        self.ostream = ostream
+        self.mark = 0
+
+    def next(self, step: str, query: str, ref=""):
+        if not self.ordered:
+            raise PendingInput(step, query, ref)
+        self.consumed += 1
+        if self.consumed == self.count:
+            # Output produced from here is new to the session user
+            self.mark = len(self.ostream.getvalue())
+        return super().next(step, query, ref)
+
+    def reject(self, msg: str):
+        self.rejected.append(self.consumed - 1)
+
+
+class CookSession(object):
+    '''
+    Step-driven cooking session
+
+    A session only holds the answers given so far. Each answer replays the
+    recipe from the start until it needs a new answer or the dish is cooked,
+    recipes being deterministic the replayed cook ends in the same state.
+    A session of n answers thus runs O(n^2) cook steps, which is cheap for
+    the recipes at hand (a replay of a full function cook is well under a
+    millisecond) and keeps sessions free of suspended threads.
+    '''
+
+    def __init__(self, dish: str, do_live_annot=False):
+        if not known_dish(dish):
+            raise RecppError(f"unknown dish '{dish}'")
+
+        self.dish = dish
+        self.do_live_annot = do_live_annot
+        self.answers = []
+        self.cook = None
+        self.pending = None
+        self.output = ""
+        self.run()
+
+    @property
+    def done(self):
+        return self.pending is None
+
+    def run(self):
+        '''Replay the recipe with the answers given so far'''
+        cook = dish_cook(self.dish)
+        cook.ostream = io.StringIO()
+        answers = SessionAnswers(self.answers, cook.ostream)
+        cook.input_provider = answers
+        try:
+            cook.cook(do_live_annot=self.do_live_annot)
+            self.pending = None
+        except PendingInput as e:
+            self.pending = e
+
+        # Rejected answers are dropped, replaying without them gives the same state
+        for i in reversed(answers.rejected):
+            del self.answers[i]
+
+        self.cook = cook
+        self.output = cook.ostream.getvalue()[answers.mark:]
+
+    def answer(self, answer):
+        '''Answer the pending step'''
+        if self.done:
+            raise RecppError("dish is already cooked")
+        self.answers.append(ScriptedAnswers.to_str(answer))
+        self.run()
+
+    def state(self):
+        state = {"dish": self.dish, "done": self.done, "output": self.output}
+        if not self.done:
+            state.update({"step": self.pending.step,
+                          "prompt": self.pending.query,
+                          "ref": self.pending.ref})
+        return state
+
+    def render(self):
+        '''
+        Render the cooked dish
+        :return: dict with the rendered files (name: code) and the console dish
+        '''
+        if not self.done:
+            raise RecppError("dish is not cooked yet")
+
+        return {"files": self.cook.render_dish(), "text": self.cook.dish_text()}
+
+
+def query_annotations(dish: str, query="*"):
+    '''Get the annotations of a dish (or all) matching a query as json dicts'''
+    if dish != "all" and not known_dish(dish):
+        raise RecppError(f"unknown dish '{dish}'")
+    index = annotation_index(all_dishes() if dish == "all" else [dish])
+    return [a.to_dict() for a in index.query(query)]
+
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+class RpcServer(object):
+    '''
+    JSON-RPC 2.0 server on newline-delimited json streams
+
+    Methods:
+    - dish.start {dish, annot}: start a session, return its state
+    - dish.answer {session, answer}: answer the pending step, return the new state
+    - dish.annotations {session} or {dish, query}: annotations collected in a session
+      or annotations of a dish matching a query
+    - dish.render {session}: render a cooked dish
+    - dish.close {session}: drop a session
+    '''
+
+    def __init__(self, istream, ostream):
+        self.istream = istream
+        self.ostream = ostream
+        self.sessions = {}
+        self.next_session = 1
+        self.methods = {
+            "dish.start": self.start,
+            "dish.answer": self.answer,
+            "dish.annotations": self.annotations,
+            "dish.render": self.render,
+            "dish.close": self.close
+        }
+
+    def session(self, session: int):
+        if session not in self.sessions:
+            raise RpcError(-32602, f"unknown session {session}")
+        return self.sessions[session]
+
+    def start(self, dish: str, annot=False):
+        session = self.next_session
+        self.sessions[session] = CookSession(dish, annot)
+        self.next_session += 1
+        return dict(self.sessions[session].state(), session=session)
+
+    def answer(self, session: int, answer):
+        self.session(session).answer(answer)
+        return dict(self.session(session).state(), session=session)
+
+    def annotations(self, session=None, dish="", query="*"):
+        if session is not None:
+            return [a.to_dict() for a in self.session(session).cook.annotations]
+        return query_annotations(dish, query)
+
+    def render(self, session: int):
+        return self.session(session).render()
+
+    def close(self, session: int):
+        self.sessions.pop(session, None)
+        return True
+
+    def handle(self, line: str):
+        '''Process a request and return the serialized response (None for notifications)'''
+        rid = None
+        notification = False
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise RpcError(-32700, "parse error")
+
+            if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+                raise RpcError(-32600, "invalid request")
+            rid = request.get("id")
+            notification = "id" not in request
+
+            method = self.methods.get(request["method"])
+            if not method:
+                raise RpcError(-32601, f"method not found: {request['method']}")
+
+            params = request.get("params", {})
+            if not isinstance(params, dict):
+                raise RpcError(-32602, "invalid params: expecting named params")
+            try:
+                import inspect
+                inspect.signature(method).bind(**params)
+            except TypeError as e:
+                raise RpcError(-32602, f"invalid params: {e}")
+
+            result = method(**params)
+            if notification:
+                return None
+            try:
+                return json.dumps({"jsonrpc": "2.0", "id": rid, "result": result})
+            except (TypeError, ValueError) as e:
+                raise RpcError(-32000, f"result of {request['method']} cannot be serialized: {e}")
+        except RpcError as e:
+            response = {"jsonrpc": "2.0", "id": rid, "error": {"code": e.code, "message": str(e)}}
+        except Exception as e:
+            response = {"jsonrpc": "2.0", "id": rid, "error": {"code": -32000, "message": str(e)}}
+
+        return None if notification else json.dumps(response)
+
+    def serve(self):
+        '''Serve requests until the input stream is closed'''
+        resident_render_cache()
+        for line in self.istream:
+            if not line.strip():
+                continue
+            response = self.handle(line)
+            if response is not None:
+                self.ostream.write(response + "\n")
+                self.ostream.flush()
+
+# ---------------------------------------------
+# HTTP service
+# ---------------------------------------------
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class SessionPool(object):
+    '''
+    Cooking sessions of the http service
+
+    Sessions are kept in least recently used order, a session idle for more
+    than ttl seconds is expired and the least recently used session is
+    evicted when the pool is full so that memory use stays bounded.
+    The pool is shared by the worker threads of the service, each session
+    has a lock so that concurrent requests on a session are cooked in turn.
+    '''
+
+    def __init__(self, max_sessions=1000, ttl=900.):
+        import threading
+
+        if max_sessions < 1:
+            raise RecppError(f"the session pool must hold at least one session ({max_sessions})")
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sessions = OrderedDict()
+        self.stats = {"created": 0, "expired": 0, "evicted": 0, "closed": 0}
+        self.lock = threading.Lock()
+
+    def expire(self):
+        '''Drop the sessions idle for more than ttl seconds'''
+        limit = time.monotonic() - self.ttl
+        with self.lock:
+            while self.sessions:
+                sid, (_, _, last) = next(iter(self.sessions.items()))
+                if last > limit:
+                    break
+                del self.sessions[sid]
+                self.stats["expired"] += 1
+
+    def add(self, session: CookSession):
+        '''Add a session, return its id'''
+        import secrets
+        import threading
+        self.expire()
+        sid = secrets.token_urlsafe(12)
+        with self.lock:
+            while len(self.sessions) >= self.max_sessions:
+                self.sessions.popitem(last=False)
+                self.stats["evicted"] += 1
+            self.sessions[sid] = (session, threading.Lock(), time.monotonic())
+            self.stats["created"] += 1
+        return sid
+
+    @contextmanager
+    def get(self, sid: str):
+        '''Use a session (context manager holding the session lock)'''
+        self.expire()
+        with self.lock:
+            if sid not in self.sessions:
+                raise HttpError(404, f"unknown or expired session {sid}")
+            session, lock, _ = self.sessions.pop(sid)
+            self.sessions[sid] = (session, lock, time.monotonic())
+        with lock:
+            yield session
+
+    def remove(self, sid: str):
+        with self.lock:
+            if self.sessions.pop(sid, None):
+                self.stats["closed"] += 1
+
+    def counters(self):
+        '''Get the session counters'''
+        self.expire()
+        with self.lock:
+            return dict(self.stats, sessions=len(self.sessions))
+
+
+class HttpServer(object):
+    '''
+    HTTP/1.1 json service hosting many step-driven cooking sessions (see CookSession)
+
+    Routes:
+    - POST /sessions {dish, annot}: start a session, return its state
+    - GET /sessions/<id>: state of a session
+    - POST /sessions/<id>/answer {answer}: answer the pending step, return the new state
+    - GET /sessions/<id>/annotations: annotations collected in a session
+    - GET /sessions/<id>/dish: render a cooked dish
+    - DELETE /sessions/<id>: drop a session
+    - GET /annotations?dish=<dish>&query=<query>: annotations of a dish matching a query
+    - GET /stats: session counters
+
+    Connections are served on the event loop, requests are processed (cooked,
+    rendered and serialized) on a pool of worker threads so that a slow session
+    never stalls the other connections.
+    '''
+
+    reasons = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+    # Max size of a request body
+    max_body = 1 << 16
+
+    def __init__(self, max_sessions=1000, ttl=900., workers=4):
+        self.pool = SessionPool(max_sessions, ttl)
+        self.workers = workers
+        self.executor = None
+        self.routes = [
+            ("POST", re.compile(r"/sessions"), self.start),
+            ("GET", re.compile(r"/sessions/([\w-]+)"), self.state),
+            ("POST", re.compile(r"/sessions/([\w-]+)/answer"), self.answer),
+            ("GET", re.compile(r"/sessions/([\w-]+)/annotations"), self.annotations),
+            ("GET", re.compile(r"/sessions/([\w-]+)/dish"), self.render),
+            ("DELETE", re.compile(r"/sessions/([\w-]+)"), self.close),
+            ("GET", re.compile(r"/annotations"), self.dish_annotations),
+            ("GET", re.compile(r"/stats"), self.stats)
+        ]
+
+    def start(self, params: Dict):
+        session = CookSession(params.get("dish", ""), bool(params.get("annot", False)))
+        sid = self.pool.add(session)
+        return 201, dict(session.state(), session=sid)
+
+    def state(self, params: Dict, sid: str):
+        with self.pool.get(sid) as session:
+            return 200, dict(session.state(), session=sid)
+
+    def answer(self, params: Dict, sid: str):
+        if "answer" not in params:
+            raise HttpError(400, "missing answer")
+        with self.pool.get(sid) as session:
+            session.answer(params["answer"])
+            return 200, dict(session.state(), session=sid)
+
+    def annotations(self, params: Dict, sid: str):
+        with self.pool.get(sid) as session:
+            return 200, [a.to_dict() for a in session.cook.annotations]
+
+    def render(self, params: Dict, sid: str):
+        with self.pool.get(sid) as session:
+            return 200, session.render()
+
+    def close(self, params: Dict, sid: str):
+        self.pool.remove(sid)
+        return 200, True
+
+    def dish_annotations(self, params: Dict):
+        return 200, query_annotations(params.get("dish", "all"), params.get("query", "*"))
+
+    def stats(self, params: Dict):
+        return 200, self.pool.counters()
+
+    def dispatch(self, method: str, target: str, body: bytes):
+        '''
+        Process a request
+        :return: tuple (status, json result)
+        '''
+        from urllib.parse import urlsplit, parse_qsl
+        url = urlsplit(target)
+        try:
+            allowed = False
+            for verb, path, handler in self.routes:
+                match = path.fullmatch(url.path)
+                if not match:
+                    continue
+                allowed = True
+                if verb != method:
+                    continue
+
+                try:
+                    params = json.loads(body) if body else {}
+                except ValueError:
+                    raise HttpError(400, "invalid json body")
+                if not isinstance(params, dict):
+                    raise HttpError(400, "expecting a json object body")
+                params.update(parse_qsl(url.query))
+                return handler(params, *match.groups())
+
+            if allowed:
+                raise HttpError(405, f"method {method} not allowed on {url.path}")
+            raise HttpError(404, f"no route for {url.path}")
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except RecppError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": str(e) or type(e).__name__}
+
+    def respond(self, method: str, target: str, body: bytes):
+        '''
+        Process a request on a worker thread
+        :return: tuple (status, serialized json result)
+        '''
+        status, result = self.dispatch(method, target, body)
+        try:
+            return status, json.dumps(result).encode("utf8")
+        except (TypeError, ValueError) as e:
+            return 500, json.dumps({"error": f"result cannot be serialized: {e}"}).encode("utf8")
+
+    async def handle_connection(self, reader, writer):
+        '''Serve the requests of a (keep-alive) connection'''
+        import asyncio
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+
+                headers = {}
+                while True:
+                    header = await reader.readline()
+                    if not header.strip():
+                        break
+                    name, _, value = header.decode("latin1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, version = line.decode("latin1").split()
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    status, data, keep = 400, b'{"error": "malformed request"}', False
+                else:
+                    connection = headers.get("connection", "").lower()
+                    keep = connection == "keep-alive" or (version == "HTTP/1.1" and connection != "close")
+                    if length > self.max_body:
+                        status, data, keep = 413, b'{"error": "request body too large"}', False
+                    else:
+                        body = await reader.readexactly(length) if length else b""
+                        status, data = await asyncio.get_running_loop().run_in_executor(
+                            self.executor, self.respond, method, target, body)
+
+                head = [f"HTTP/1.1 {status} {self.reasons[status]}",
+                        "Content-Type: application/json",
+                        f"Content-Length: {len(data)}"]
+                if not keep:
+                    head.append("Connection: close")
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin1") + data)
+                await writer.drain()
+                if not keep:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def serve(self, host: str, port: int):
+        '''Serve requests until interrupted'''
+        import asyncio
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        resident_render_cache()
+
+        async def run():
+            server = await asyncio.start_server(self.handle_connection, host, port)
+            print_msg(f"serving cooking sessions on http://{host}:{port}", "INFO")
+            sys.stdout.flush()
+            async with server:
+                await server.serve_forever()
+
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="recpp-http")
+        try:
+            asyncio.run(run())
+        except KeyboardInterrupt:
+            print_msg("http service stopped", "INFO")
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+# ---------------------------------------------
+# Entry point
+# ---------------------------------------------
+
+
+def main():
+    '''Command line entry point (see recpp.py)'''
+    parser = ArgumentParser(formatter_class=RawTextHelpFormatter)
+    parser.add_argument('--keep', '-k', dest='annot_whitelist', type=str, default='*',
+                        help='desc: annotation query in list annotations mode\n'
+                        '      (type tokens, reference prefixes and message words combined with AND, OR, NOT)\n'
+                        'depends: -l -a\n'
+                        'default: *\n'
+                        'example: recpp.py -d class -l -a -k PERF,USA\n'
+                        'example: recpp.py -d all -l -a -k "PERF AND CON NOT MAINT"\n'
+                        'example: recpp.py -d all -l -a -k "CERT.* OR cppcore.ES"')
+    parser.add_argument('--search', '-s', dest='search', type=str, default='',
+                        help='desc: rank annotations by relevance to some free text in list annotations mode\n'
+                        'depends: -l -a\n'
+                        'example: recpp.py -d all -l -a -s "move semantics"')
+    parser.add_argument('--output-dir', '-o', dest='odir', type=str, default='',
+                        help='desc: output directory or archive (.tar, .tar.gz, .tar.zst, .zip) where to store generated code\n'
+                        'warning: is only used in recipe mode for class and function dishes\n'
+                        'default: output to console\n'
+                        'example: recpp.py -d class -o /tmp/recpp\n'
+                        'example: recpp.py -b spec.json -o /tmp/recpp.tar.zst')
+    parser.add_argument('--merge', dest='merge', type=str, nargs='?', const='', default=None, metavar='ID',
+                        help='desc: merge generated code into the existing files of the output directory, between\n'
+                        '      "// recpp:begin <ID>" and "// recpp:end" marker lines (the region is appended to files\n'
+                        '      without it, ID defaults to the generated file name, code outside regions is kept)\n'
+                        'depends: -o (directory)\n'
+                        'example: recpp.py -d class -o src/foo --merge Foo\n'
+                        'example: recpp.py -b spec.json -o src --merge')
+    parser.add_argument('--bench', dest='bench', action='store_true',
+                        help='desc: also generate a google benchmark translation unit (function_bench.cpp) for\n'
+                        '      free functions\n'
+                        'depends: cook mode (-d function) or -b (default of the bench key of the dish specs)\n'
+                        'example: recpp.py -d function -o /tmp/recpp --bench')
+    parser.add_argument('--annot', '-a', dest='annot', action='store_true',
+                        help='desc (list mode,-l): display annotations instead of steps\n'
+                        'example: recpp.py -d ds -l -a\n'
+                        'desc (recipe mode): display annotations interactively instead of in generated pseudo-code\n'
+                        'example: recpp.py -d algo -a')
+    parser.add_argument('--list', '-l', dest='act', action='store_const', const='recipe', default='cook',
+                        help='desc: list recipe steps or annotations in a recipe\n'
+                        'example (list steps): recpp.py -d function -l\n'
+                        'example (list annotations): recpp.py -d function -l -a')
+    parser.add_argument('--format', dest='format', choices=['text', 'ndjson'], default='text',
+                        help='desc: list mode output format, ndjson streams one json object per annotation or step\n'
+                        '      without banner (errors on stderr)\n'
+                        'depends: -l\n'
+                        'example: recpp.py -d all -l -a -k PERF --format ndjson | jq .ref')
+    parser.add_argument('--dish', '-d', dest='dish',
+                        type=str, default='design', help='desc: type of dish to cook\n'
+                        '      (design, class, function, lambda, ds, algo, impl, all or a recipe pack dish)\n'
+                        'warning: "all" can only be used in list mode\n'
+                        'example (recipe mode): reccp.py -d impl\n'
+                        'example (list mode,-l): reccp.py -d all -l -a')
+    parser.add_argument('--batch', '-b', dest='batch', type=str, default='',
+                        help='desc: cook all dishes described in a json or yaml spec file without prompting\n'
+                        'example: recpp.py -b spec.json -o /tmp/recpp')
+    parser.add_argument('--watch', '-w', dest='watch', action='store_true',
+                        help='desc: cook the dishes of the batch spec again each time the recipes, the templates\n'
+                        '      or the batch spec change (only the affected dishes are cooked again)\n'
+                        'depends: -b\n'
+                        'example: recpp.py -b spec.json -o /tmp/recpp --watch')
+    parser.add_argument('--jobs', '-j', dest='jobs', type=int, default=0,
+                        help='desc: number of worker processes in batch mode\n'
+                        'depends: -b\n'
+                        'default: cpu count')
+    parser.add_argument('--serve', dest='serve', action='store_true',
+                        help='desc: serve JSON-RPC requests on stdio (one json object per line) for editor integrations\n'
+                        'example: recpp.py --serve')
+    parser.add_argument('--http', dest='http', type=str, default='',
+                        help='desc: serve many concurrent cooking sessions as a json http service on [host:]port\n'
+                        '      (see --max-sessions and --session-ttl for session eviction)\n'
+                        'example: recpp.py --http 127.0.0.1:8080')
+    parser.add_argument('--max-sessions', dest='max_sessions', type=int, default=1000,
+                        help='desc: number of sessions kept by the http service, the least recently used is evicted\n'
+                        'depends: --http\n'
+                        'default: 1000')
+    parser.add_argument('--session-ttl', dest='session_ttl', type=float, default=900.,
+                        help='desc: seconds after which an idle session of the http service expires\n'
+                        'depends: --http\n'
+                        'default: 900')
+    parser.add_argument('--lint', dest='lint', type=str, default='',
+                        help='desc: check a C++ source tree against the recipe annotations that have a check\n'
+                        '      (-k selects the annotations, -j sets the number of worker processes)\n'
+                        'example: recpp.py --lint src\n'
+                        'example: recpp.py --lint src -k "PERF OR CON"')
+    parser.add_argument('--decide', dest='decide', type=str, default='',
+                        help='desc: evaluate the decision trees of a recipe on the feature vectors of a json file\n'
+                        '      (list of {feature: value}, - for stdin), one json decision is printed per line\n'
+                        'depends: -d design, ds or algo\n'
+                        'example: recpp.py -d design --decide inventory.json')
+    parser.add_argument('--record', dest='record', type=str, default='',
+                        help='desc: record the answers of an interactive recipe in a session file\n'
+                        'example: recpp.py -d class --record session.json')
+    parser.add_argument('--replay', dest='replay', type=str, default='',
+                        help='desc: cook the dish of a recorded session file without prompting\n'
+                        'example: recpp.py --replay session.json -o /tmp/recpp')
+    parser.add_argument('--profile', dest='profile', type=str, default='',
+                        help='desc: record wall time and allocations of each stage of the run (input wait excluded)\n'
+                        '      in a chrome trace file (chrome://tracing)\n'
+                        'depends: recipe mode or -b\n'
+                        'example: recpp.py -b spec.json --profile trace.json')
+    args = parser.parse_args()
+
+    if args.serve:
+        RpcServer(sys.stdin, sys.stdout).serve()
+        sys.exit(0)
+
+    if args.http:
+        if args.max_sessions < 1:
+            parser.error("argument --max-sessions: must be at least 1")
+        host, _, port = args.http.rpartition(":")
+        HttpServer(args.max_sessions, args.session_ttl).serve(host or "127.0.0.1", int(port))
+        sys.exit(0)
+
+    if args.lint:
+        try:
+            sys.exit(1 if lint(args.lint, whitelist=args.annot_whitelist, jobs=args.jobs) else 0)
+        except RecppError as e:
+            print_msg(str(e))
+            sys.exit(2)
+
+    if args.merge is not None and not args.odir and not args.batch:
+        parser.error("argument --merge: requires an output directory (-o)")
+
+    # recipe packs are only known once scanned, the dish cannot be an argparse choice
+    if not args.batch and not args.replay and args.dish != "all" and not known_dish(args.dish):
+        parser.error(f"argument --dish/-d: invalid choice: '{args.dish}' "
+                     f"(choose from {', '.join(all_dishes() + ['all'])})")
+
+    if args.decide:
+        try:
+            with (sys.stdin if args.decide == "-" else open(args.decide, "r", encoding="utf8")) as f:
+                vectors = json.load(f)
+            for decision in decide(args.dish, vectors):
+                print(json.dumps(decision))
+        except Exception as e:
+            print_msg(str(e))
+            sys.exit(1)
+        sys.exit(0)
+
+    if args.act == 'recipe' and args.format == 'ndjson':
+        try:
+            recipe(dish=args.dish, with_annot=args.annot, whitelist=args.annot_whitelist,
+                   search=args.search, fmt=args.format)
+        except Exception as e:
+            print_msg(str(e), file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+
+    print(_recpp_header)
+
+    profiler = Profiler() if args.profile else None
+    recorder = None
+    status = 0
+    try:
+        if args.batch and args.watch:
+            watch(spec=args.batch, odir=args.odir, jobs=args.jobs, merge=args.merge, bench=args.bench)
+        elif args.batch:
+            status = 1 if cook_batch(spec=args.batch, odir=args.odir, jobs=args.jobs, profiler=profiler,
+                                        merge=args.merge, bench=args.bench) else 0
+        elif args.replay:
+            session = ReplayInput.load_session(args.replay)
+            replay = ReplayInput(session["answers"])
+            cook(dish=session["dish"], display_live_annot=session.get("annot", False), odir=args.odir,
+                 profiler=profiler, input_provider=replay, merge=args.merge,
+                 bench=args.bench)
+            if replay.answers:
+                print_msg(f"{len(replay.answers)} recorded answers were not used", "WARN")
+        elif args.act == 'cook':
+            if args.record:
+                recorder = RecordingInput(InteractiveInput(), args.record, args.dish, args.annot)
+            cook(dish=args.dish, display_live_annot=args.annot, odir=args.odir,
+                 profiler=profiler, input_provider=recorder, merge=args.merge,
+                 bench=args.bench)
+        else:
+            recipe(dish=args.dish, with_annot=args.annot,
+                   whitelist=args.annot_whitelist, search=args.search)
+    except Exception as e:
+        print_msg(str(e))
+    finally:
+        if recorder:
+            recorder.close()
+            print_msg(f"session recorded in {args.record}", "INFO")
+        if profiler:
+            profiler.close()
+            profiler.dump(args.profile)
+            print_msg(f"profile written to {args.profile}", "INFO")
+
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
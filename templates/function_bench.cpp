@@ -0,0 +1,132 @@
+//
+// recpp auto generated function benchmark pseudo code (google benchmark)
+//
+
+// PERF [cppcore.Per.6]: do not make claims about performance without measurements
+// PERF [recpp.internal]: build and run benchmarks in release mode (e.g. -O2 -DNDEBUG) on an idle machine
+// PERF [recpp.internal]: compare runs with benchmark's compare.py rather than single timings
+
+#include "function.h"
+
+#include <benchmark/benchmark.h>
+
+#include <cstddef>
+#include <random>
+#include <type_traits>
+#include <utility>
+#include <vector>
+
+namespace {
+
+template <class T, class = void>
+struct is_sequence : std::false_type {};
+
+template <class T>
+struct is_sequence<T, std::void_t<typename T::value_type,
+    decltype(std::declval<T&>().push_back(std::declval<typename T::value_type>()))>> : std::true_type {};
+
+template <class T>
+struct dependent_false : std::false_type {};
+
+// Input of size n for a parameter of type T
+// TODO: add an overload for the parameter types that are not arithmetic or sequences
+//       (e.g. pointers to a buffer kept alive by the benchmark, user types, maps)
+template <class T>
+T make_input(std::size_t n, std::mt19937_64& rng) {
+    if constexpr (std::is_arithmetic_v<T>) {
+        return static_cast<T>(rng() % (n + 1));
+    } else if constexpr (is_sequence<T>::value) {
+        T input;
+        for (std::size_t i = 0; i < n; ++i) {
+            input.push_back(make_input<typename T::value_type>(n, rng));
+        }
+        return input;
+    } else {
+        static_assert(dependent_false<T>::value, "recpp: no input generator for this parameter type");
+    }
+}
+
+} // namespace
+
+{%- set moved = namespace(params=false) %}
+{%- for item in params if "&&" in item.type %}{% set moved.params = true %}{% endfor %}
+
+{%- macro call(index) %}
+{%- if params %}
+        // PERF [recpp.internal]: hide the input values from the optimizer (no constant folding{% if "constexpr" in attr.pre %} of the constexpr call{% endif %})
+{%- endif %}
+{%- for item in params %}
+        benchmark::DoNotOptimize({% if "&&" in item.type %}{{ item.name }}_args[{{ index }}]{% else %}{{ item.name }}{% endif %});
+{%- endfor %}
+{%- if tparams %}
+        // TODO: give the template arguments that cannot be deduced
+{%- endif %}
+        {% if ret.rtype != "void" %}auto result = {% endif %}{{ name }}(
+{%- for item in params -%}
+{% if "&&" in item.type %}std::move({{ item.name }}_args[{{ index }}]){% else %}{{ item.name }}{% endif %}{{ ", " if not loop.last }}
+{%- endfor %});
+{%- if ret.rtype != "void" %}
+        // PERF [recpp.internal]: keep the result alive so that the call is not optimized away
+        benchmark::DoNotOptimize(result);
+{%- endif %}
+        // PERF [recpp.internal]: force pending writes to memory (side effects of the call)
+        benchmark::ClobberMemory();
+{%- endmacro %}
+///
+/// \brief Benchmark of {{ name }}{% if responsability %} ({{ responsability }}){% endif %}
+{%- if params %}
+/// \note state.range(0) is the input size n, inputs are generated out of the timed loop
+{%- endif %}
+///
+static void BM_{{ name }}(benchmark::State& state) {
+{%- if params %}
+    const auto n = static_cast<std::size_t>(state.range(0));
+    // REL [recpp.internal]: fixed seed so that runs are repeatable
+    std::mt19937_64 rng(42);
+{%- endif %}
+{%- for item in params %}
+    auto {{ item.name }} = make_input<std::decay_t<{{ item.type }}>>(n, rng);
+{%- endfor %}
+{%- if moved.params %}
+    // PERF [recpp.internal]: the arguments consumed by the calls are copied by batches out of the timed loop,
+    //                        the timing is paused once per batch rather than once per call
+    constexpr benchmark::IterationCount batch = 16;
+{%- for item in params if "&&" in item.type %}
+    std::vector<std::decay_t<{{ item.type }}>> {{ item.name }}_args;
+{%- endfor %}
+
+    while (state.KeepRunningBatch(batch)) {
+        state.PauseTiming();
+{%- for item in params if "&&" in item.type %}
+        {{ item.name }}_args.assign(batch, {{ item.name }});
+{%- endfor %}
+        state.ResumeTiming();
+        for (benchmark::IterationCount i = 0; i < batch; ++i) {
+{{- call("i") | indent(4) }}
+        }
+    }
+{%- else %}
+
+    for (auto _ : state) {
+{{- call("") }}
+    }
+{%- endif %}
+{%- if params %}
+
+    // PERF [recpp.internal]: input size used to fit the complexity (e.g. O(N), O(NlgN))
+    state.SetComplexityN(state.range(0));
+{%- endif %}
+}
+
+{% if params -%}
+// PERF [recpp.internal]: input sizes from 2^4 to 2^16, the asymptotic complexity is fitted on them
+BENCHMARK(BM_{{ name }})->RangeMultiplier(4)->Range(1 << 4, 1 << 16)->Complexity(benchmark::oAuto);
+{%- else -%}
+BENCHMARK(BM_{{ name }});
+{%- endif %}
+{%- if not thread_hostile %}
+// CON [recpp.internal]: the function is not thread-hostile, uncomment to measure contention
+// BENCHMARK(BM_{{ name }}){% if params %}->Arg(1 << 10){% endif %}->ThreadRange(1, 8);
+{%- endif %}
+
+BENCHMARK_MAIN();
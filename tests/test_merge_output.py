@@ -0,0 +1,126 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from recpp import MergeOutput, RecppError  # noqa: E402
+
+
+class MergeOutputTest(unittest.TestCase):
+    '''Merge of generated regions into existing files (MergeOutput)'''
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self.tmp.name)
+        self.path = self.dir / "foo.h"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def merge(self, body: bytes, region=b"foo"):
+        return MergeOutput.merge(self.path, region, body)
+
+    def test_new_file(self):
+        self.assertTrue(self.merge(b"int x;\n"))
+        eol = os.linesep.encode()
+        self.assertEqual(self.path.read_bytes(),
+                         b"// recpp:begin foo" + eol + b"int x;" + eol + b"// recpp:end" + eol)
+
+    def test_append(self):
+        self.path.write_bytes(b"#pragma once\n")
+        self.assertTrue(self.merge(b"int x;\n"))
+        self.assertEqual(self.path.read_bytes(),
+                         b"#pragma once\n// recpp:begin foo\nint x;\n// recpp:end\n")
+
+    def test_append_no_final_newline(self):
+        self.path.write_bytes(b"#pragma once")
+        self.assertTrue(self.merge(b"int x;\n"))
+        self.assertEqual(self.path.read_bytes(),
+                         b"#pragma once\n// recpp:begin foo\nint x;\n// recpp:end\n")
+
+    def test_append_crlf(self):
+        self.path.write_bytes(b"#pragma once\r\n")
+        self.assertTrue(self.merge(b"int x;\nint y;\n"))
+        self.assertEqual(self.path.read_bytes(),
+                         b"#pragma once\r\n// recpp:begin foo\r\nint x;\r\nint y;\r\n// recpp:end\r\n")
+
+    def test_replace_crlf(self):
+        self.path.write_bytes(b"a\r\n// recpp:begin foo\r\nint x;\r\n// recpp:end\r\nb\r\n")
+        self.assertFalse(self.merge(b"int x;\n"))
+        self.assertTrue(self.merge(b"long x;\nlong y;\n"))
+        self.assertEqual(self.path.read_bytes(),
+                         b"a\r\n// recpp:begin foo\r\nlong x;\r\nlong y;\r\n// recpp:end\r\nb\r\n")
+
+    def test_region_end_without_final_newline(self):
+        self.path.write_bytes(b"a\n// recpp:begin foo\nint x;\n// recpp:end")
+        self.assertTrue(self.merge(b"long x;\n"))
+        self.assertEqual(self.path.read_bytes(), b"a\n// recpp:begin foo\nlong x;\n// recpp:end")
+
+    def test_unchanged_region_is_not_written(self):
+        self.path.write_bytes(b"a\n// recpp:begin foo\nint x;\n// recpp:end\n")
+        os.utime(str(self.path), (0, 0))
+        self.assertFalse(self.merge(b"int x;\n"))
+        self.assertEqual(self.path.stat().st_mtime, 0)
+
+    def test_same_size_in_place(self):
+        self.path.write_bytes(b"a\n// recpp:begin foo\nint x;\n// recpp:end\nb\n")
+        inode = self.path.stat().st_ino
+        self.assertTrue(self.merge(b"int y;\n"))
+        self.assertEqual(self.path.read_bytes(), b"a\n// recpp:begin foo\nint y;\n// recpp:end\nb\n")
+        self.assertEqual(self.path.stat().st_ino, inode)
+
+    def test_resize_replaces_file(self):
+        self.path.write_bytes(b"a\n// recpp:begin foo\nint x;\n// recpp:end\nb\n")
+        self.path.chmod(0o640)
+        self.assertTrue(self.merge(b"int x;\nint y;\n"))
+        self.assertEqual(self.path.read_bytes(),
+                         b"a\n// recpp:begin foo\nint x;\nint y;\n// recpp:end\nb\n")
+        self.assertEqual(self.path.stat().st_mode & 0o777, 0o640)
+        self.assertEqual([p.name for p in self.dir.iterdir()], ["foo.h"])
+
+    def test_other_regions_are_kept(self):
+        self.path.write_bytes(b"// recpp:begin bar\nint b;\n// recpp:end bar\n"
+                              b"// recpp:begin foo\nint x;\n// recpp:end foo\n")
+        self.assertTrue(self.merge(b"int xx;\n"))
+        self.assertEqual(self.path.read_bytes(),
+                         b"// recpp:begin bar\nint b;\n// recpp:end bar\n"
+                         b"// recpp:begin foo\nint xx;\n// recpp:end foo\n")
+
+    def test_invalid_regions(self):
+        cases = {
+            b"// recpp:begin foo\n// recpp:begin bar\n// recpp:end\n// recpp:end\n": "is not closed",
+            b"a\n// recpp:begin foo\nint x;\n": "is not closed",
+            b"// recpp:begin foo\n// recpp:end\n// recpp:begin foo\n// recpp:end\n": "duplicate region",
+            b"// recpp:end\n": "unmatched region end",
+            b"// recpp:begin foo\n// recpp:end bar\n": "unmatched region end",
+            b"// recpp:begin\n// recpp:end\n": "region without id",
+        }
+        for content, error in cases.items():
+            with self.subTest(content=content):
+                self.path.write_bytes(content)
+                with self.assertRaisesRegex(RecppError, error):
+                    self.merge(b"int x;\n")
+                self.assertEqual(self.path.read_bytes(), content)
+
+    def test_write_region_id(self):
+        self.path.write_bytes(b"// recpp:begin Foo\nint x;\n// recpp:end\n")
+        output = MergeOutput(str(self.dir), "Foo")
+        self.assertTrue(output.write("foo.h", ["long x;"]))
+        self.assertFalse(output.write("foo.h", ["long x;\n"]))
+        self.assertEqual(output.written, ["foo.h"])
+        self.assertEqual(output.unchanged, ["foo.h"])
+        self.assertEqual(self.path.read_bytes(), b"// recpp:begin Foo\nlong x;\n// recpp:end\n")
+
+        MergeOutput(str(self.dir)).write("foo.h", ["int y;\n"])
+        self.assertTrue(self.path.read_bytes().endswith(b"// recpp:begin foo.h\nint y;\n// recpp:end\n"))
+
+    def test_invalid_region_id(self):
+        with self.assertRaises(RecppError):
+            MergeOutput(str(self.dir), "foo bar")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,19 @@
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+
+_root = Path(__file__).resolve().parents[1]
+
+
+class StartupBudgetTest(unittest.TestCase):
+    '''List mode startup regression check (bench/startup_budget.py)'''
+
+    def test_list_mode_budget(self):
+        res = subprocess.run([sys.executable, str(_root / "bench" / "startup_budget.py")],
+                             stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        self.assertEqual(res.returncode, 0, res.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+_root = Path(__file__).resolve().parents[1]
+
+
+class ZipappTest(unittest.TestCase):
+    '''Smoke test of the single file build (tools/build_zipapp.py)'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.pyz = str(Path(cls.tmp.name) / "recpp.pyz")
+        subprocess.run([sys.executable, str(_root / "tools" / "build_zipapp.py"), "-o", cls.pyz],
+                       cwd=cls.tmp.name, stdout=subprocess.DEVNULL, check=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def run_recpp(self, cmd):
+        res = subprocess.run(cmd, cwd=self.tmp.name, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+        self.assertEqual(res.returncode, 0, res.stderr)
+        self.assertNotIn("ERROR", res.stdout)
+        return res.stdout
+
+    def test_list(self):
+        self.assertIn("Here is the recipe!", self.run_recpp([sys.executable, self.pyz, "-d", "class", "-l"]))
+
+    def test_list_matches_source_tree(self):
+        self.assertEqual(self.run_recpp([sys.executable, self.pyz, "-d", "all", "-l", "-a"]),
+                         self.run_recpp([sys.executable, str(_root / "recpp.py"), "-d", "all", "-l", "-a"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
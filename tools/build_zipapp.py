@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#! /usr/bin/env python3
+
+# ---------------------------------------------
+# Single file zipapp build
+#
+# Packs recpp.py and recpp_core.py in an executable zip archive with:
+# - the recipes compiled into a python module (recpp_bundle),
+# - the templates compiled into jinja2 template modules,
+# - jinja2 and markupsafe (pure python) unless --no-deps,
+# all modules being precompiled to bytecode so that recpp runs from
+# the archive without reading loose files or parsing templates:
+# python recpp.pyz -d class -o /tmp/recpp
+# ---------------------------------------------
+import compileall
+import hashlib
+import os
+import py_compile
+import shutil
+import sys
+import tempfile
+import zipapp
+from argparse import ArgumentParser
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(_root))
+
+import recpp  # noqa: E402
+
+# Package dir of the compiled templates in the archive
+_templates_package = "recpp_templates"
+
+# Vendored runtime dependencies (compiled extensions are left out, both have a python fallback)
+_deps = ["jinja2", "markupsafe"]
+
+_main = '''import runpy
+runpy.run_module("recpp", run_name="__main__", alter_sys=True)
+'''
+
+
+def bundle_source():
+    '''Source of the recpp_bundle module holding the compiled recipes'''
+    # Plain dicts, lists and tuples of the compiled cookbook (the loaded recipes are read-only
+    # mappings whose repr is not python source)
+    sources = {name: None for name in sorted(os.listdir(recpp._recpp_recipe_path)) if name.endswith("_recipe.json")}
+    packed = recpp.compile_cookbook(sources, recpp._recpp_recipe_path)["recipes"]
+    # Digest of the template sources, part of the render cache keys
+    digest = hashlib.blake2b(digest_size=20)
+    for path in sorted(Path(recpp._recpp_template_path).iterdir()):
+        digest.update(path.name.encode() + b"\0" + path.read_bytes() + b"\0")
+    return ("# Generated by tools/build_zipapp.py, do not edit\n"
+            f"templates = {_templates_package!r}\n"
+            f"digest = {digest.hexdigest()!r}\n"
+            f"recipes = {packed!r}\n")
+
+
+def compile_templates(target: Path):
+    '''Compile the templates into jinja2 template modules'''
+    from jinja2 import Environment, FileSystemLoader
+    env = Environment(loader=FileSystemLoader(recpp._recpp_template_path))
+    env.compile_templates(str(target), zip=None, ignore_errors=False)
+
+
+def vendor(name: str, target: Path):
+    '''Copy the python files of an installed package'''
+    module = __import__(name)
+    shutil.copytree(os.path.dirname(module.__file__), str(target / name),
+                    ignore=shutil.ignore_patterns("__pycache__", "*.so", "*.pyd", "*.c"))
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="build a single file recpp zipapp")
+    parser.add_argument('--output', '-o', dest='output', default="recpp.pyz",
+                        help='archive path (default: recpp.pyz)')
+    parser.add_argument('--python', dest='python', default="/usr/bin/env python3",
+                        help='interpreter of the archive shebang (default: /usr/bin/env python3)')
+    parser.add_argument('--no-deps', dest='deps', action='store_false',
+                        help='do not vendor jinja2 and markupsafe (they must be installed on the target)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        staging = Path(tmp)
+        for name in ["recpp.py", "recpp_core.py"]:
+            shutil.copy(str(_root / name), str(staging / name))
+        (staging / "recpp_bundle.py").write_text(bundle_source(), encoding="utf8")
+        (staging / "__main__.py").write_text(_main, encoding="utf8")
+        compile_templates(staging / _templates_package)
+        if args.deps:
+            for name in _deps:
+                vendor(name, staging)
+
+        # Bytecode next to each source (zipimport ignores __pycache__), the sources are kept
+        # as a fallback for interpreters of another version
+        if not compileall.compile_dir(str(staging), quiet=1, legacy=True, optimize=0,
+                                      invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH):
+            sys.exit(1)
+
+        zipapp.create_archive(str(staging), args.output, interpreter=args.python, compressed=True)
+
+    size = os.path.getsize(args.output)
+    print(f"INFO: {args.output} built ({size / 1024:.0f} KiB)")
@@ -1,46 +1,137 @@
 // The module 'vscode' contains the VS Code extensibility API
 // Import the module and reference it with the alias vscode in your code below
 import * as vscode from 'vscode';
+import * as cp from 'child_process';
+import * as readline from 'readline';
+
+// Client of a resident `recpp.py --serve` process (JSON-RPC, one json object per line)
+class RecppServer implements vscode.Disposable {
+	private proc: cp.ChildProcess | undefined;
+	private nextId = 1;
+	private pending = new Map<number, { resolve: (result: any) => void, reject: (error: Error) => void }>();
+
+	constructor(private log: vscode.OutputChannel) {}
+
+	private start(): cp.ChildProcess {
+		// Retrieve config up-to-date each time the server is (re)started
+		const config = vscode.workspace.getConfiguration('recpp');
+
+		const proc = cp.spawn(config.python, ['recpp.py', '--serve'], { cwd: config.recpp });
+		readline.createInterface({ input: proc.stdout! }).on('line', (line) => this.onResponse(line));
+		proc.stderr!.on('data', (data) => this.log.append(data.toString()));
+		proc.on('error', (err) => this.onExit(err.message));
+		proc.on('exit', (code) => this.onExit(`recpp server exited with code ${code}`));
+		return proc;
+	}
+
+	private onResponse(line: string) {
+		let response: any;
+		try {
+			response = JSON.parse(line);
+		} catch (e) {
+			this.log.appendLine(`recpp: unexpected server output: ${line}`);
+			return;
+		}
+
+		const call = this.pending.get(response.id);
+		if (call === undefined) {
+			return;
+		}
+
+		this.pending.delete(response.id);
+		if (response.error) {
+			call.reject(new Error(response.error.message));
+		} else {
+			call.resolve(response.result);
+		}
+	}
+
+	private onExit(reason: string) {
+		this.proc = undefined;
+		this.pending.forEach((call) => call.reject(new Error(reason)));
+		this.pending.clear();
+	}
+
+	call(method: string, params: object): Promise<any> {
+		if (this.proc === undefined) {
+			this.proc = this.start();
+		}
+
+		const id = this.nextId++;
+		const request = JSON.stringify({ jsonrpc: '2.0', id: id, method: method, params: params });
+		return new Promise((resolve, reject) => {
+			this.pending.set(id, { resolve: resolve, reject: reject });
+			this.proc!.stdin!.write(request + '\n');
+		});
+	}
+
+	dispose() {
+		if (this.proc !== undefined) {
+			this.proc.kill();
+		}
+	}
+}
+
+async function cookDish(server: RecppServer, log: vscode.OutputChannel, dish: string) {
+	// Remember the editor where the user asked for the dish, input boxes steal focus
+	const editor = vscode.window.activeTextEditor;
+
+	let state = await server.call('dish.start', { dish: dish, annot: true });
+	const session = state.session;
+	try {
+		while (!state.done) {
+			if (state.output) {
+				log.append(state.output);
+				log.show(true);
+			}
+
+			const answer = await vscode.window.showInputBox({
+				prompt: state.prompt,
+				placeHolder: state.ref ? `ref: ${state.ref}` : undefined,
+				ignoreFocusOut: true
+			});
+
+			if (answer === undefined) {
+				return;
+			}
+
+			state = await server.call('dish.answer', { session: session, answer: answer });
+		}
+
+		if (state.output) {
+			log.append(state.output);
+		}
+
+		const served = await server.call('dish.render', { session: session });
+		const files = Object.keys(served.files);
+		const code = files.length ? files.map((f) => served.files[f]).join('\n') : served.text;
+
+		if (editor !== undefined) {
+			await editor.edit((edit) => edit.replace(editor.selection, code));
+		} else {
+			const doc = await vscode.workspace.openTextDocument({ language: 'cpp', content: code });
+			await vscode.window.showTextDocument(doc);
+		}
+	} finally {
+		server.call('dish.close', { session: session }).catch(() => {});
+	}
+}
 
 // this method is called when your extension is activated
 // your extension is activated the very first time the command is executed
 export function activate(context: vscode.ExtensionContext) {
 
-	const RECPP_TERM = "recpp ext term";
-	
 	// This line of code will only be executed once when your extension is activated
 	console.log('recpp extension activated');
 
-	//vscode.window.onDidOpenTerminal((terminal: vscode.Terminal) => {
-		//vscode.window.showInformationMessage(`onDidOpenTerminal, name: ${terminal.name}`);
-	//});
+	const log = vscode.window.createOutputChannel('recpp');
+	const server = new RecppServer(log);
+	context.subscriptions.push(log, server);
 
 	let reccp_cb = function(dish: string) {
-		// Retrieve config up-to-date each time the command is executed
-		const config = vscode.workspace.getConfiguration('recpp');
-
-		// Check if the terminal exists
-		const terminals = <vscode.Terminal[]>(<any>vscode.window).terminals;
-
-		let terminal = terminals.find((element) => element.name === RECPP_TERM);
-		if (terminal === undefined) {
-			terminal = vscode.window.createTerminal({
-				name: "recpp ext term",
-				cwd: config.recpp,
-				hideFromUser: false
-			} as any);
-		}
-
-		terminal.show(false);
-		terminal.sendText(`${config.python} recpp.py -d ${dish} -a`);
-	
-		// TODO: If/When the API will provide a way to wait for process completion
-		//       + hook terminal output (onDidWriteTerminalData), it would be interesting
-		//       to filter and copy code to active document
-		/// let activeEditor = vscode.window.activeTextEditor;
-		// activeEditor.edit((selectedText) => {
-		//	selectedText.replace(activeEditor.selection, "newText");
-		//})
+		cookDish(server, log, dish).catch((err) => {
+			vscode.window.showErrorMessage(`recpp: ${err.message}`);
+		});
 	};
 
 	context.subscriptions.push(vscode.commands.registerCommand('recpp.function', reccp_cb.bind(null, "function")));